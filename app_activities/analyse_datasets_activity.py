@@ -242,21 +242,19 @@ class AnalyseDatasetsActivity(app_framework.ActivityBase):
             selectedviewindex = self._viewdata_list.currentIndex()
             if selectedviewindex == 0:
                 # View analysis data.
-                # Convert from tree model to table model.
-                targetdataset = plankton_core.DatasetTable()
-                self._analysisdata.get_data().convert_to_table_dataset(targetdataset)
+                # Table view of the tree model. Items are fetched from the tree when displayed.
+                tableview = self._analysisdata.get_data().create_table_view()
                 # View model.
-                self._tableview.setTableModel(targetdataset)
+                self._tableview.setTableModel(tableview)
                 self._refresh_viewed_data_table()
             elif selectedviewindex == 1:
                 # View filtered data only.
                 self._tab4widget.update_filter() # Must be done before create_filtered_dataset().
                 filtereddataset = self._analysisdata.create_filtered_dataset()
-                # Convert from tree model to table model.
-                targetdataset = plankton_core.DatasetTable()
-                filtereddataset.convert_to_table_dataset(targetdataset)
+                # Table view of the tree model. Items are fetched from the tree when displayed.
+                tableview = filtereddataset.create_table_view()
                 # View model.
-                self._tableview.setTableModel(targetdataset)
+                self._tableview.setTableModel(tableview)
                 self._refresh_viewed_data_table()
             elif selectedviewindex == 2:
                 # Statistical data.
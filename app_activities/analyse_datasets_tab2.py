@@ -126,14 +126,14 @@ class AnalyseDatasetsTab2(QtWidgets.QWidget):
                     break # Break loop.
             #
             if nodelevel == 'dataset':
-                if key in analysisdata.get_data_dict().keys():
+                if analysisdata.has_data(key):
                     columncontent_set.add(str(analysisdata.get_data(key)))
                 else:
                     columncontent_set.add('') # Add empty field.
             #    
             for visitnode in analysisdata.get_children():
                 if nodelevel == 'visit':
-                    if key in visitnode.get_data_dict().keys():
+                    if visitnode.has_data(key):
                         columncontent_set.add(str(visitnode.get_data(key)))
                     else:
                         columncontent_set.add('') # Add empty field.
@@ -141,7 +141,7 @@ class AnalyseDatasetsTab2(QtWidgets.QWidget):
                 #
                 for samplenode in visitnode.get_children():
                     if nodelevel == 'sample':
-                        if key in samplenode.get_data_dict().keys():
+                        if samplenode.has_data(key):
                             columncontent_set.add(str(samplenode.get_data(key)))
                         else:
                             columncontent_set.add('') # Add empty field.
@@ -149,7 +149,7 @@ class AnalyseDatasetsTab2(QtWidgets.QWidget):
                     #
                     for variablenode in samplenode.get_children():
                         if nodelevel == 'variable':
-                            if key in variablenode.get_data_dict().keys():
+                            if variablenode.has_data(key):
                                 columncontent_set.add(str(variablenode.get_data(key)))
                             else:
                                 columncontent_set.add('') # Add empty field.
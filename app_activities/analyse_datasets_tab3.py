@@ -164,6 +164,25 @@ class AnalyseDatasetsTab3(QtWidgets.QWidget):
                     selected_trophic_type_text = '-'.join(selected_trophic_type_list) 
                     selected_lifestage_list = self._lifestage_listview.getSelectedDataList()
                     selected_lifestage_text = '-'.join(selected_lifestage_list) 
+                    # Species related values are resolved once for each taxon.
+                    species = plankton_core.Species()
+                    rankfield = None
+                    if selected_taxon_rank == 'Plankton group':
+                        rankfield = 'plankton_group'
+                    elif selected_taxon_rank in ['Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species']:
+                        rankfield = 'taxon_' + selected_taxon_rank.lower()
+                    rankinfo = {}
+                    if rankfield:
+                        scientificnames = set()
+                        for visitnode in self._analysisdata.get_data().get_children(): 
+                            for samplenode in visitnode.get_children():
+                                for variablenode in samplenode.get_children():
+                                    scientificnames.add(variablenode.get_data('scientific_name'))
+                        rankinfo = species.enrich_batch(scientificnames, [rankfield])
+                    classificationfields = ['taxon_kingdom', 'taxon_phylum', 'taxon_class', 
+                                            'taxon_order', 'taxon_family', 'taxon_genus', 
+                                            'taxon_species']
+                    classificationinfo = {}
                     #
                     for visitnode in self._analysisdata.get_data().get_children()[:]: 
                         for samplenode in visitnode.get_children()[:]:
@@ -182,22 +201,9 @@ class AnalyseDatasetsTab3(QtWidgets.QWidget):
                                     #
                                     if selected_taxon_rank == 'Biota (all levels)':
                                         newtaxon = 'Biota' # Biota is above kingdom in the taxonomic hierarchy.
-                                    elif selected_taxon_rank == 'Plankton group':
-                                        newtaxon = plankton_core.Species().get_plankton_group_from_taxon_name(variablenode.get_data('scientific_name'))
-                                    elif selected_taxon_rank == 'Kingdom':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_kingdom')
-                                    elif selected_taxon_rank == 'Phylum':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_phylum')
-                                    elif selected_taxon_rank == 'Class':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_class')
-                                    elif selected_taxon_rank == 'Order':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_order')
-                                    elif selected_taxon_rank == 'Family':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_family')
-                                    elif selected_taxon_rank == 'Genus':
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_genus')
-                                    elif selected_taxon_rank == 'Species': 
-                                        newtaxon = plankton_core.Species().get_taxon_value(variablenode.get_data('scientific_name'), 'taxon_species')
+                                    elif rankfield:
+                                        # Plankton group, or Kingdom to Species.
+                                        newtaxon = rankinfo[variablenode.get_data('scientific_name')][rankfield]
                                     elif selected_taxon_rank == 'Scientific name': 
                                         newtaxon = variablenode.get_data('scientific_name')
                                     elif selected_taxon_rank == 'Kingdom (from dataset)':
@@ -220,7 +226,8 @@ class AnalyseDatasetsTab3(QtWidgets.QWidget):
                                         newtaxon = variablenode.get_data('scientific_name')
                                     # 
                                     if not newtaxon:
-                                        toolbox_utils.Logging().warning('Not match for selected rank. "not-designated" assigned for: ' + variablenode.get_data('scientific_name'))
+                                        toolbox_utils.Logging().warning('Not match for selected rank. "not-designated" assigned for', 
+                                                                        item = variablenode.get_data('scientific_name'))
                                         newtaxon = 'not-designated' # Use this if empty.
                                     #
                                     taxontrophic_type = variablenode.get_data('trophic_type')
@@ -273,13 +280,10 @@ class AnalyseDatasetsTab3(QtWidgets.QWidget):
                                 newvariable.add_data('unit', unit)
                                 newvariable.add_data('value', aggregatedvariables[variablekeytuple])
                                 # Add taxon class, etc. based on taxon name.
-                                newvariable.add_data('taxon_kingdom', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_kingdom'))
-                                newvariable.add_data('taxon_phylum', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_phylum'))
-                                newvariable.add_data('taxon_class', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_class'))
-                                newvariable.add_data('taxon_order', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_order'))
-                                newvariable.add_data('taxon_family', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_family'))
-                                newvariable.add_data('taxon_genus', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_genus'))
-                                newvariable.add_data('taxon_species', plankton_core.Species().get_taxon_value(newtaxon, 'taxon_species'))
+                                if newtaxon not in classificationinfo:
+                                    classificationinfo.update(species.enrich_batch([newtaxon], classificationfields))
+                                for field in classificationfields:
+                                    newvariable.add_data(field, classificationinfo[newtaxon][field])
                     #
                     self._main_activity.update_viewed_data_and_tabs()    
                 except UserWarning as e:
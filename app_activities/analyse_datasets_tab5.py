@@ -43,10 +43,8 @@ class AnalyseDatasetsTab5(QtWidgets.QWidget):
             if analysisdata:        
                 # Search for all parameters in analysis data.
                 parameterset = set()
-                for visitnode in analysisdata.get_children():
-                    for samplenode in visitnode.get_children():
-                        for variablenode in samplenode.get_children():
-                            parameterset.add(variablenode.get_data('parameter') + ' (' + variablenode.get_data('unit') + ')')
+                for parameter, unit in analysisdata.get_index('parameter_unit').keys():
+                    parameterset.add(parameter + ' (' + unit + ')')
                 parameterlist = sorted(parameterset)
                 self._parameter_list.addItems(parameterlist)
         #
@@ -253,15 +251,14 @@ class AnalyseDatasetsTab5(QtWidgets.QWidget):
             value = None
             date_list = []
             value_list = [] 
-            for visitnode in dataset.get_children():
-                date = visitnode.get_data('sample_date')
-                for samplenode in visitnode.get_children():
-                    for variablenode in samplenode.get_children():
-                        parameter = variablenode.get_data('parameter') + ' (' + variablenode.get_data('unit') + ')'
-                        if parameter == selectedparameter:                        
-                            value = variablenode.get_data('value')
-                            date_list.append(date)
-                            value_list.append(value)               
+            for (parameter, unit), variablenodes in dataset.get_index('parameter_unit').items():
+                if (parameter + ' (' + unit + ')') != selectedparameter:
+                    continue
+                for variablenode in variablenodes:
+                    date = variablenode.get_parent().get_parent().get_data('sample_date')
+                    value = variablenode.get_data('value')
+                    date_list.append(date)
+                    value_list.append(value)               
             #                
             try:
                 plotdata.add_plot(plot_name = selectedparameter, 
@@ -284,21 +281,20 @@ class AnalyseDatasetsTab5(QtWidgets.QWidget):
             value = None
             date_list = []
             value_list = [] 
-            for visitnode in dataset.get_children():
-                # Replace year with '0000' seasonal cycle.
-                date = visitnode.get_data('sample_date')
-                try: 
-                    date = str('2000' + date[4:])
-                except:
-                    continue # Skip to the next if date is invalid.
-                #
-                for samplenode in visitnode.get_children():
-                    for variablenode in samplenode.get_children():
-                        parameter = variablenode.get_data('parameter') + ' (' + variablenode.get_data('unit') + ')'
-                        if parameter == selectedparameter:                        
-                            value = variablenode.get_data('value')
-                            date_list.append(date)
-                            value_list.append(value)               
+            for (parameter, unit), variablenodes in dataset.get_index('parameter_unit').items():
+                if (parameter + ' (' + unit + ')') != selectedparameter:
+                    continue
+                for variablenode in variablenodes:
+                    # Replace year with '0000' seasonal cycle.
+                    date = variablenode.get_parent().get_parent().get_data('sample_date')
+                    try: 
+                        date = str('2000' + date[4:])
+                    except:
+                        continue # Skip to the next if date is invalid.
+                    #
+                    value = variablenode.get_data('value')
+                    date_list.append(date)
+                    value_list.append(value)               
             #                
             try:
                 plotdata.add_plot(plot_name = selectedparameter, 
@@ -43,10 +43,8 @@ class AnalyseDatasetsTab7(QtWidgets.QWidget):
             if analysisdata:        
                 # Search for all parameters in analysis data.
                 parameterset = set()
-                for visitnode in analysisdata.get_children():
-                    for samplenode in visitnode.get_children():
-                        for variablenode in samplenode.get_children():
-                            parameterset.add(variablenode.get_data('parameter') + ' (' + variablenode.get_data('unit') + ')')
+                for parameter, unit in analysisdata.get_index('parameter_unit').keys():
+                    parameterset.add(parameter + ' (' + unit + ')')
                 parameterlist = sorted(parameterset)
                 self._parameter_list.addItems(parameterlist)
         #
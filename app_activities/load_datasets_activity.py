@@ -32,6 +32,7 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
         self._lastusedsharkwebfilename = ''
         self._lastusedphytowinfilename = ''
         self._lastusedplanktoncounterfilename = ''
+        self._lastusedsnapshotfilename = ''
         # Initialize parent (self._create_content will be called).
         super(LoadDatasetsActivity, self).__init__(name, parentwidget)
         # Log available parsers when GUI setup has finished.
@@ -257,6 +258,7 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
 #                                     'PhytoWin (*.csv)']
         self._predefinedformat_list = ['Plankton counter sample(s) (*.xlsx)', 
                                        'SHARKweb download(s) (*.txt)',
+                                       'Dataset snapshot(s) (*.ptbx_snapshot)',
 #                                        'Phytoplankton-archive (*.csv)'
                                        ]
         self._predefined_format_combo.addItems(self._predefinedformat_list)
@@ -300,6 +302,8 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
                 self._load_plankton_counter_excel()
             elif selectedformat == 'SHARKweb download(s) (*.txt)':
                 self._load_sharkweb_datasets()
+            elif selectedformat == 'Dataset snapshot(s) (*.ptbx_snapshot)':
+                self._load_snapshot_datasets()
     #         elif selectedformat == 'Phytoplankton-archive (*.csv)':
     #             self._load_phytowin_datasets()
             else: 
@@ -375,12 +379,17 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
                                     namefilter)
                 # Check if user pressed ok or cancel.
                 if filenames:
+                    update_trophic_type = self._predefined_trophic_list_checkbox.isChecked()
+                    importjobs = []
                     for filename in filenames:
+                        importjobs.append({'filename': filename, 
+                                           'import_format': 'SHARKweb', 
+                                           'update_trophic_type': update_trophic_type})
+                    # Files are imported in parallel.
+                    def dataset_imported(job_index, datasetnode):
+                        """ Called for each file, in the same order as selected. """
+                        filename = filenames[job_index]
                         self._lastusedsharkwebfilename = filename
-                        update_trophic_type = self._predefined_trophic_list_checkbox.isChecked()
-                        datasetnode = plankton_core.DataImportManager().import_dataset_file(filename, 
-                                                                                            import_format = 'SHARKweb',
-                                                                                            update_trophic_type=update_trophic_type)
                         # Use datasets-wrapper to emit change notification when dataset list is updated.
                         app_framework.ToolboxDatasets().emit_change_notification()
                         # Add metadata related to imported file.
@@ -389,6 +398,10 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
                         datasetnode.add_metadata('file_path', filename)
                         datasetnode.add_metadata('import_column', '-')
                         datasetnode.add_metadata('export_column', '-')
+                        self._write_import_progress(job_index, len(filenames), filename)
+                    #
+                    plankton_core.DataImportManager().import_dataset_files(importjobs, 
+                                                                           progress_callback = dataset_imported)
                 #
             except Exception as e:
                 toolbox_utils.Logging().error('SHARKweb file import failed on exception: ' + str(e))
@@ -405,6 +418,49 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
             debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
             toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
 
+    def _load_snapshot_datasets(self):
+        """ """
+        try:
+            try:
+                toolbox_utils.Logging().log('') # Empty line.
+                toolbox_utils.Logging().log('Importing datasets...')
+                toolbox_utils.Logging().start_accumulated_logging()
+                self._write_to_status_bar('Importing datasets...')
+    
+                # Show select file dialog box. Multiple files can be selected.
+                namefilter = 'Dataset snapshots (*.ptbx_snapshot);;All files (*.*)'
+                filenames, _filters = QtWidgets.QFileDialog.getOpenFileNames(
+                                    self,
+                                    'Load dataset snapshot(s). ',
+                                    self._lastusedsnapshotfilename,
+                                    namefilter)
+                # Check if user pressed ok or cancel.
+                if filenames:
+                    for filename in filenames:
+                        self._lastusedsnapshotfilename = filename
+                        datasetnode = plankton_core.DataImportManager().import_dataset_file(filename, 
+                                                                                            import_format = 'Snapshot')
+                        # Use datasets-wrapper to emit change notification when dataset list is updated.
+                        app_framework.ToolboxDatasets().emit_change_notification()
+                        # Parser and column metadata are stored in the snapshot.
+                        datasetnode.add_metadata('file_name', os.path.basename(filename))
+                        datasetnode.add_metadata('file_path', filename)
+                #
+            except Exception as e:
+                toolbox_utils.Logging().error('Dataset snapshot import failed on exception: ' + str(e))
+                QtWidgets.QMessageBox.warning(self, 'Snapshot loading.\n', 
+                                          'Dataset snapshot import failed on exception.\n' + str(e))
+                raise
+            finally:
+                datasetcount = len(plankton_core.Datasets().get_datasets())
+                self._write_to_status_bar('Imported datasets: ' + str(datasetcount))
+                toolbox_utils.Logging().log_all_accumulated_rows()
+                toolbox_utils.Logging().log('Importing datasets done. Number of imported datasets: ' + str(datasetcount))
+        #
+        except Exception as e:
+            debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
+            toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
+
 #     def _load_phytowin_datasets(self):
 #         """ """
 #         try:
@@ -612,53 +668,43 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
                 # Check if user pressed ok or cancel.
                 self._tabledataset = plankton_core.DatasetTable()
                 if filenames:
+                    # Text files may have strange encodings.
+                    if str(self._textfile_encoding_list.currentText()) == '<platform default>':
+                        textfileencoding = locale.getpreferredencoding()
+                    else:
+                        textfileencoding = str(self._textfile_encoding_list.currentText())                        
+                    # Set up for import file parsing.
+                    parserfile = str(pathlib.Path(self._parser_path, str(self._textfile_parser_list.currentText())))
+                    importcolumn = str(self._textfile_importcolumn_list.currentText())
+                    exportcolumn = str(self._textfile_exportcolumn_list.currentText())
+                    update_trophic_type = self._textfile_trophic_list_checkbox.isChecked()
+                    importjobs = []
                     for filename in filenames:
+                        importjobs.append({'filename': filename, 
+                                           'import_format': 'ParsedText', 
+                                           'update_trophic_type': update_trophic_type, 
+                                           'parser_file': parserfile, 
+                                           'import_column': importcolumn, 
+                                           'export_column': exportcolumn, 
+                                           'text_file_encoding': textfileencoding})
+                    # Files are imported and parsed in parallel.
+                    def dataset_imported(job_index, dataset):
+                        """ Called for each file, in the same order as selected. """
+                        filename = filenames[job_index]
                         # Store selected path. Will be used as default next time.
                         self._last_used_textfile_name = filename
-                        # Text files may have strange encodings.
-                        if str(self._textfile_encoding_list.currentText()) == '<platform default>':
-                            textfileencoding = locale.getpreferredencoding()
-                        else:
-                            textfileencoding = str(self._textfile_encoding_list.currentText())                        
-                        # Set up for import file parsing.
-                        importmanager = plankton_core.ImportManager(str(pathlib.Path(self._parser_path, str(self._textfile_parser_list.currentText()))),
-                                                         str(self._textfile_importcolumn_list.currentText()),
-                                                         str(self._textfile_exportcolumn_list.currentText()))
-                        # Import and parse file.
-                        dataset = importmanager.import_text_file(filename, textfileencoding)
-                        
-                        
-                        
-                                
-                        
-                        # Update trophic_type.
-                        update_trophic_type = self._textfile_trophic_list_checkbox.isChecked()
-                        print('DEBUG: excel_trophic_list')
-                        for visit in dataset.get_children():
-                            for sample in visit.get_children():
-                                for variable in sample.get_children():
-                                    trophic_type = variable.get_data('trophic_type', '')
-                                    # Update all trophic_types.
-                                    if update_trophic_type:
-                                        scientific_name = variable.get_data('scientific_name', '')
-                                        size_class = variable.get_data('size_class', '')
-                                        trophic_type = plankton_core.Species().get_bvol_value(scientific_name, size_class, 'trophic_type')
-                                        if trophic_type:
-                                            variable.add_data('trophic_type', trophic_type) # Use existing if not in local list.
-                                    # Replace empty with NS=Not specified.
-                                    if not trophic_type:
-                                        variable.add_data('trophic_type', 'NS')
-                        
-                        
-                        
                         # Add metadata related to imported file.
-                        dataset.add_metadata('parser', str(pathlib.Path(self._parser_path, str(self._textfile_parser_list.currentText()))))
+                        dataset.add_metadata('parser', parserfile)
                         dataset.add_metadata('file_name', os.path.basename(filename))
                         dataset.add_metadata('file_path', filename)
-                        dataset.add_metadata('import_column', str(self._textfile_importcolumn_list.currentText()))
-                        dataset.add_metadata('export_column', str(self._textfile_exportcolumn_list.currentText()))
-                        # Add to dataset list. (Note:ToolboxDatasets is a wrapper containing the 'datasetListChanged'-signal).
-                        app_framework.ToolboxDatasets().add_dataset(dataset)
+                        dataset.add_metadata('import_column', importcolumn)
+                        dataset.add_metadata('export_column', exportcolumn)
+                        # Use datasets-wrapper to emit change notification when dataset list is updated.
+                        app_framework.ToolboxDatasets().emit_change_notification()
+                        self._write_import_progress(job_index, len(filenames), filename)
+                    #
+                    plankton_core.DataImportManager().import_dataset_files(importjobs, 
+                                                                           progress_callback = dataset_imported)
                 #
             except Exception as e:
                 toolbox_utils.Logging().error('Text file import failed on exception: ' + str(e))
@@ -784,46 +830,37 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
                 # Check if user pressed ok or cancel.
                 self._tabledataset = plankton_core.DatasetTable()
                 if filenames:
+                    # Set up for import file parsing.
+                    parserfile = str(pathlib.Path(self._parser_path, str(self._excel_parser_list.currentText())))
+                    importcolumn = str(self._excel_importcolumn_list.currentText())
+                    exportcolumn = str(self._excel_exportcolumn_list.currentText())
+                    update_trophic_type = self._excel_trophic_list_checkbox.isChecked()
+                    importjobs = []
                     for filename in filenames:
+                        importjobs.append({'filename': filename, 
+                                           'import_format': 'ParsedExcel', 
+                                           'update_trophic_type': update_trophic_type, 
+                                           'parser_file': parserfile, 
+                                           'import_column': importcolumn, 
+                                           'export_column': exportcolumn})
+                    # Files are imported and parsed in parallel.
+                    def dataset_imported(job_index, dataset):
+                        """ Called for each file, in the same order as selected. """
+                        filename = filenames[job_index]
                         # Store selected path. Will be used as default next time.
                         self._last_used_excelfile_name = filename
-                        # Set up for import file parsing.
-                        importmanager = plankton_core.ImportManager(str(pathlib.Path(self._parser_path, str(self._excel_parser_list.currentText()))),
-                                                         str(self._excel_importcolumn_list.currentText()),
-                                                         str(self._excel_exportcolumn_list.currentText()))
-                        # Import and parse file.
-                        dataset = importmanager.import_excel_file(filename)
-                        
-                        
-                        
-                        # Update trophic_type.
-                        update_trophic_type = self._excel_trophic_list_checkbox.isChecked()
-                        print('DEBUG: excel_trophic_list')
-                        for visit in dataset.get_children():
-                            for sample in visit.get_children():
-                                for variable in sample.get_children():
-                                    trophic_type = variable.get_data('trophic_type', '')
-                                    # Update all trophic_types.
-                                    if update_trophic_type:
-                                        scientific_name = variable.get_data('scientific_name', '')
-                                        size_class = variable.get_data('size_class', '')
-                                        trophic_type = plankton_core.Species().get_bvol_value(scientific_name, size_class, 'trophic_type')
-                                        if trophic_type:
-                                            variable.add_data('trophic_type', trophic_type) # Use existing if not in local list.
-                                    # Replace empty with NS=Not specified.
-                                    if not trophic_type:
-                                        variable.add_data('trophic_type', 'NS')
-                        
-                        
-                        
                         # Add metadata related to imported file.
-                        dataset.add_metadata('parser', str(pathlib.Path(self._parser_path, str(self._excel_parser_list.currentText()))))
+                        dataset.add_metadata('parser', parserfile)
                         dataset.add_metadata('file_name', os.path.basename(filename))
                         dataset.add_metadata('file_path', filename)
-                        dataset.add_metadata('import_column', str(self._excel_importcolumn_list.currentText()))
-                        dataset.add_metadata('export_column', str(self._excel_exportcolumn_list.currentText()))
-                        # Add to dataset list. (Note:ToolboxDatasets is a wrapper containing the 'datasetListChanged'-signal).
-                        app_framework.ToolboxDatasets().add_dataset(dataset)
+                        dataset.add_metadata('import_column', importcolumn)
+                        dataset.add_metadata('export_column', exportcolumn)
+                        # Use datasets-wrapper to emit change notification when dataset list is updated.
+                        app_framework.ToolboxDatasets().emit_change_notification()
+                        self._write_import_progress(job_index, len(filenames), filename)
+                    #
+                    plankton_core.DataImportManager().import_dataset_files(importjobs, 
+                                                                           progress_callback = dataset_imported)
             #
             except Exception as e:
                 toolbox_utils.Logging().error('Excel file import failed on exception: ' + str(e))
@@ -840,6 +877,13 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
             debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
             toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
 
+    def _write_import_progress(self, job_index, job_count, filename):
+        """ Shows per-file progress when multiple files are imported. """
+        self._write_to_status_bar('Importing datasets... ' + str(job_index + 1) + ' of ' + 
+                                  str(job_count) + ' done: ' + os.path.basename(filename))
+        # Repaint the status bar during the import.
+        QtWidgets.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+
     # ===== LOADED DATASETS =====    
     def _content_loaded_datasets(self):
         """ """
@@ -871,6 +915,7 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
         # Buttons.
         self._unloadalldatasets_button = QtWidgets.QPushButton('Remove all datasets')
         self._unloadmarkeddatasets_button = QtWidgets.QPushButton('Remove marked dataset(s)')
+        self._savesnapshot_button = QtWidgets.QPushButton('Save marked dataset as snapshot...')
         # If checked the selected dataset content should be viewed in the dataset viewer tool.
         self._viewdataset_checkbox = QtWidgets.QCheckBox('View marked dataset')
 #         self._viewdataset_checkbox.setChecked(False)
@@ -879,11 +924,13 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
         # Button connections.
         self._unloadalldatasets_button.clicked.connect(self._unload_all_datasets)                
         self._unloadmarkeddatasets_button.clicked.connect(self._unload_marked_datasets)                
+        self._savesnapshot_button.clicked.connect(self._save_marked_dataset_snapshot)                
         self._viewdataset_checkbox.stateChanged.connect(self._selection_changed)
         # Layout widgets.
         buttonlayout = QtWidgets.QHBoxLayout()
         buttonlayout.addWidget(self._unloadalldatasets_button)
         buttonlayout.addWidget(self._unloadmarkeddatasets_button)
+        buttonlayout.addWidget(self._savesnapshot_button)
         buttonlayout.addWidget(self._viewdataset_checkbox)
         buttonlayout.addStretch(5)
         #
@@ -918,6 +965,35 @@ class LoadDatasetsActivity(app_framework.ActivityBase):
             debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
             toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
 
+    def _save_marked_dataset_snapshot(self):
+        """ Tree datasets can be saved as binary snapshots, for fast loading. """
+        try:
+            modelIndex = self._datasets_table.getSelectionModel().currentIndex()
+            if not modelIndex.isValid():
+                QtWidgets.QMessageBox.information(self, 'Information', 'No dataset is marked.')
+                return
+            dataset = app_framework.ToolboxDatasets().get_dataset_by_index(modelIndex.row())
+            if not isinstance(dataset, plankton_core.DatasetNode):
+                QtWidgets.QMessageBox.information(self, 'Information', 'Only tree datasets can be saved as snapshots.')
+                return
+            #
+            namefilter = 'Dataset snapshots (*.ptbx_snapshot);;All files (*.*)'
+            filename, _filters = QtWidgets.QFileDialog.getSaveFileName(
+                            self,
+                            'Save dataset snapshot',
+                            self._lastusedsnapshotfilename,
+                            namefilter)
+            filename = str(filename) # QString to str.
+            # Check if user pressed ok or cancel.
+            if filename:
+                self._lastusedsnapshotfilename = filename
+                dataset.save_snapshot(filename)
+                toolbox_utils.Logging().log('Dataset snapshot saved: ' + filename)
+        #
+        except Exception as e:
+            debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
+            toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
+
     def _update_dataset_list(self):
         """ """
         try:
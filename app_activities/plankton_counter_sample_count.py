@@ -34,6 +34,8 @@ class PlanktonCounterSampleCount(QtWidgets.QWidget):
         #
         # Log available parsers when GUI setup has finished.
         QtCore.QTimer.singleShot(200, self.load_data)
+        # Use updated taxonomy if the species lists are reloaded during counting.
+        plankton_core.SpeciesLoader().speciesReloaded.connect(self._species_reloaded)
         #
         self.sample_locked = True
         self.set_read_only()
@@ -65,6 +67,17 @@ class PlanktonCounterSampleCount(QtWidgets.QWidget):
             debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
             toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
 
+    def _species_reloaded(self):
+        """ Counted values are kept. Species related values and lists are updated. """
+        try:
+            self._current_sample_object.update_species_info()
+            self._selected_species_list_changed()
+            self._update_summary()
+        #
+        except Exception as e:
+            debug_info = self.__class__.__name__ + ', row  ' + str(sys._getframe().f_lineno)
+            toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
+
     def save_data(self):
         """ Called at shutdown and when needed. """
         if not self.sample_locked:
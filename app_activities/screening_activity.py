@@ -617,14 +617,14 @@ class ScreeningActivity(app_framework.ActivityBase):
                 if item.checkState() == QtCore.Qt.Checked:        
                     #
                     if nodelevel == 'dataset':
-                        if key in dataset.get_data_dict().keys():
+                        if dataset.has_data(key):
                             columncontent_set.add(str(dataset.get_data(key)))
                         else:
                             columncontent_set.add('') # Add empty field.
                     #
                     for visitnode in dataset.get_children():
                         if nodelevel == 'visit':
-                            if key in visitnode.get_data_dict().keys():
+                            if visitnode.has_data(key):
                                 columncontent_set.add(str(visitnode.get_data(key)))
                             else:
                                 columncontent_set.add('') # Add empty field.
@@ -632,7 +632,7 @@ class ScreeningActivity(app_framework.ActivityBase):
                         #
                         for samplenode in visitnode.get_children():
                             if nodelevel == 'sample':
-                                if key in samplenode.get_data_dict().keys():
+                                if samplenode.has_data(key):
                                     columncontent_set.add(str(samplenode.get_data(key)))
                                 else:
                                     columncontent_set.add('') # Add empty field.
@@ -640,7 +640,7 @@ class ScreeningActivity(app_framework.ActivityBase):
                             #
                             for variablenode in samplenode.get_children():
                                 if nodelevel == 'variable':
-                                    if key in variablenode.get_data_dict().keys():
+                                    if variablenode.has_data(key):
                                         columncontent_set.add(str(variablenode.get_data(key)))
                                     else:
                                         columncontent_set.add('') # Add empty field.
@@ -26,6 +26,9 @@ class MainWindow(QtWidgets.QMainWindow):
     
     Note: Camel case method names are used since the class is inherited from a Qt class.
     """
+    # Used to pass log messages from background threads to the main thread.
+    _logMessage = QtCore.pyqtSignal(str)
+    
     def __init__(self):
         """ """
         # Initialize parent.
@@ -46,6 +49,7 @@ class MainWindow(QtWidgets.QMainWindow):
                              time.strftime('%Y-%m-%d %H:%M:%S') )
         self._logfile.write('')
         self._logtool = None # Should be initiated later.
+        self._logMessage.connect(self._writeToLog)
         toolbox_utils.Logging().set_log_target(self)
         # Setup main window.
         self._createActions()
@@ -127,8 +131,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Load resources when the main event loop has started.
 #         if app_framework.ToolboxSettings().get_value('Resources:Load at startup'):
 #             QtCore.QTimer.singleShot(10, app_framework.ToolboxResources().loadAllResources)
-        QtCore.QTimer.singleShot(1000, self._loadResources)
-#        self._loadResources()
+        self._loadResources()
         
     def closeEvent(self, event):
         """ Called on application shutdown. """
@@ -146,6 +149,8 @@ class MainWindow(QtWidgets.QMainWindow):
         for 'toggleViewAction' to see the implementation.
         """
         self._filemenu = self.menuBar().addMenu(self.tr('&File'))
+        self._filemenu.addAction(self._reloadspeciesaction)
+        self._filemenu.addAction(self._lookupstatisticsaction)
         self._filemenu.addSeparator()
         self._filemenu.addAction(self._quitaction)
 #         self._viewmenu = self.menuBar().addMenu(self.tr('&View'))
@@ -309,12 +314,27 @@ class MainWindow(QtWidgets.QMainWindow):
         self._quitaction.setStatusTip(self.tr('Quit the application'))
         self._quitaction.triggered.connect(self.close)
         #
+        self._reloadspeciesaction = QtWidgets.QAction(self.tr('&Reload species lists'), self)
+        self._reloadspeciesaction.setStatusTip(self.tr('Load species lists again after changes in the species files'))
+        self._reloadspeciesaction.triggered.connect(self._reloadSpecies)
+        #
+        self._lookupstatisticsaction = QtWidgets.QAction(self.tr('Log species &lookup statistics'), self)
+        self._lookupstatisticsaction.setStatusTip(self.tr('Log calls, misses and time for species lookups after each import or analysis'))
+        self._lookupstatisticsaction.setCheckable(True)
+        self._lookupstatisticsaction.toggled.connect(self._toggleLookupStatistics)
+        #
         self._aboutaction = QtWidgets.QAction(self.tr('&About'), self)
         self._aboutaction.setStatusTip(self.tr('Show the application\'s About box'))
         self._aboutaction.triggered.connect(self._about)
 
     def write_to_log(self, message):
-        """ Log to file and to the log tool when available. """
+        """ Log to file and to the log tool when available. 
+            May be called from background threads. The message is then passed 
+            to the main thread by the Qt signal/slot mechanism. """
+        self._logMessage.emit(message)
+    
+    def _writeToLog(self, message):
+        """ Connected to _logMessage. Always executed in the main thread. """
 #        self.console.addItem(message)
         try:
             self._logfile.write(message + '\r\n')
@@ -331,14 +351,32 @@ class MainWindow(QtWidgets.QMainWindow):
             print('Exception (write_to_log):', str(e))
 
     def _loadResources(self):
-        """ """
-        try:
-            # Load resources here.
-            self.statusBar().showMessage(self.tr('Loading species lists...'))
-            plankton_core.Species()
-
-        finally:
-            self.statusBar().showMessage(self.tr(''))
+        """ Species lists are loaded in a background thread to keep the 
+            application responsive during startup. """
+        self.statusBar().showMessage(self.tr('Loading species lists...'))
+        speciesloader = plankton_core.SpeciesLoader()
+        speciesloader.speciesLoaded.connect(self._speciesLoaded)
+        speciesloader.speciesReloaded.connect(self._speciesLoaded)
+        speciesloader.start()
+    
+    def _reloadSpecies(self):
+        """ Species lists are reloaded in a background thread. Old lists are used 
+            until the new lists are loaded. """
+        self.statusBar().showMessage(self.tr('Reloading species lists...'))
+        plankton_core.SpeciesLoader().reload()
+    
+    def _toggleLookupStatistics(self, checked):
+        """ Connected to the checkable action in the File menu. Statistics are 
+            only collected when activated, since counting adds some overhead. """
+        if checked:
+            plankton_core.Species().start_lookup_statistics()
+        else:
+            plankton_core.Species().log_lookup_statistics()
+            plankton_core.Species().stop_lookup_statistics()
+    
+    def _speciesLoaded(self):
+        """ Connected to SpeciesLoader.speciesLoaded. """
+        self.statusBar().showMessage(self.tr(''))
 
     def setVersion(self, version):
         """ """
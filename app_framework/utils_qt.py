@@ -8,10 +8,13 @@
 This module contains customized GUI-related classes.
 """
 
+import re
+
 from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
 
+import toolbox_utils
 import plankton_core
 
 class RichTextQLabel(QtWidgets.QLabel):
@@ -244,7 +247,7 @@ class ToolboxQTableView(QtWidgets.QTableView):
         else:
             """ Use this method if the default model should be replaced by a filtered model. """
             # Filter proxy model.
-            self.filterproxymodel = QtCore.QSortFilterProxyModel(self)
+            self.filterproxymodel = ToolboxPrefixFilterProxyModel(self)
             self.filterproxymodel.setSourceModel(self._tablemodel)
             self.filterproxymodel.setFilterKeyColumn(filter_column_index)
             self.setModel(self.filterproxymodel)
@@ -291,11 +294,7 @@ class ToolboxQTableView(QtWidgets.QTableView):
     def onFilterTextChanged(self, text):
         """ link the textChanged signal to this method for filtering. 
             In the constructor 'filter_column_index' must be defined. """          
-        filterString = QtCore.QRegExp(str(text),
-                                QtCore.Qt.CaseInsensitive,
-#                                 QtCore.QRegExp.RegExp
-                                )
-        self.filterproxymodel.setFilterRegExp(filterString)
+        self.filterproxymodel.setFilterText(str(text))
         
 
 class ToolboxTableModel(QtCore.QAbstractTableModel):
@@ -350,6 +349,142 @@ class ToolboxTableModel(QtCore.QAbstractTableModel):
         return QtCore.QVariant()
 
 
+class ToolboxPrefixFilterProxyModel(QtCore.QAbstractProxyModel):
+    """ Type-ahead filter for ToolboxTableModel. Rows are shown if a word in the 
+        filter column starts with the filter text, case insensitive. 
+        A prefix index is created when the source model is reset. Each change 
+        of the filter text is then a lookup in the index, instead of a regular 
+        expression tested on all rows as in QSortFilterProxyModel.
+        If no word matches, rows containing the text anywhere are shown. 
+        Filter texts with regular expression characters, e.g. 'sp.' or '^Chaeto', 
+        are used as case insensitive regular expressions as before. """
+    _regex_characters = set('.^$*+?{}[]\\|()')
+    
+    def __init__(self, parent = None):
+        """ """
+        QtCore.QAbstractProxyModel.__init__(self, parent)
+        self._filter_column = 0
+        self._filter_text = ''
+        self._prefix_index = toolbox_utils.PrefixIndex()
+        self._rows = None # Source rows to show. None: No filter, all rows are shown.
+        self._proxy_rows = {} # Key: source row. Value: proxy row.
+        
+    def setSourceModel(self, source_model):
+        """ Overridden method. """
+        QtCore.QAbstractProxyModel.setSourceModel(self, source_model)
+        source_model.modelAboutToBeReset.connect(self.beginResetModel)
+        source_model.modelReset.connect(self._sourceModelReset)
+        self._updateIndex()
+        
+    def setFilterKeyColumn(self, column):
+        """ Same name as in QSortFilterProxyModel. """
+        self.beginResetModel()
+        self._filter_column = column
+        self._updateIndex()
+        self.endResetModel()
+        
+    def setFilterText(self, text):
+        """ """
+        self.beginResetModel()
+        self._filter_text = text
+        self._updateRows()
+        self.endResetModel()
+        
+    def _sourceModelReset(self):
+        """ """
+        self._updateIndex()
+        self.endResetModel()
+        
+    def _updateIndex(self):
+        """ """
+        column_values = []
+        modeldata = self.sourceModel().getModeldata() if self.sourceModel() else None
+        if modeldata is not None:
+            if self._filter_column < modeldata.get_column_count():
+                column_values = [str(modeldata.get_data_item(row, self._filter_column)) 
+                                 for row in range(modeldata.get_row_count())]
+        self._prefix_index.set_strings(column_values)
+        self._updateRows()
+        
+    def _updateRows(self):
+        """ """
+        text = ' '.join(self._filter_text.lower().split())
+        if not text:
+            self._rows = None
+            self._proxy_rows = {}
+            return
+        rows = None
+        if not self._regex_characters.isdisjoint(self._filter_text):
+            try:
+                regex = re.compile(self._filter_text, re.IGNORECASE)
+                rows = [row for row, value in enumerate(self._prefix_index.get_strings()) 
+                        if regex.search(value)]
+            except re.error:
+                pass # Incomplete expression while typing. Used as text.
+        if rows is None:
+            rows = self._prefix_index.find(text)
+            if not rows:
+                # Not at the start of a word. Search for the text anywhere.
+                rows = self._prefix_index.find_substring(text)
+        self._rows = rows
+        self._proxy_rows = {sourcerow: proxyrow for proxyrow, sourcerow in enumerate(rows)}
+        
+    def mapToSource(self, proxy_index):
+        """ Overridden abstract method. """
+        if (not proxy_index.isValid()) or (self.sourceModel() is None):
+            return QtCore.QModelIndex()
+        row = proxy_index.row()
+        if self._rows is not None:
+            if row >= len(self._rows):
+                return QtCore.QModelIndex()
+            row = self._rows[row]
+        return self.sourceModel().index(row, proxy_index.column())
+        
+    def mapFromSource(self, source_index):
+        """ Overridden abstract method. """
+        if not source_index.isValid():
+            return QtCore.QModelIndex()
+        row = source_index.row()
+        if self._rows is not None:
+            row = self._proxy_rows.get(row, None)
+            if row is None:
+                return QtCore.QModelIndex()
+        return self.index(row, source_index.column())
+        
+    def index(self, row, column, parent = QtCore.QModelIndex()):
+        """ Overridden abstract method. """
+        if parent.isValid() or (row < 0) or (column < 0) or \
+           (row >= self.rowCount()) or (column >= self.columnCount()):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column)
+        
+    def parent(self, index = QtCore.QModelIndex()):
+        """ Overridden abstract method. Table model, no parents. """
+        return QtCore.QModelIndex()
+        
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        """ Overridden abstract method. """
+        if parent.isValid() or (self.sourceModel() is None):
+            return 0
+        if self._rows is None:
+            return self.sourceModel().rowCount()
+        return len(self._rows)
+        
+    def columnCount(self, parent = QtCore.QModelIndex()):
+        """ Overridden abstract method. """
+        if parent.isValid() or (self.sourceModel() is None):
+            return 0
+        return self.sourceModel().columnCount()
+        
+    def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+        """ Overridden method. Row numbers are shown for the filtered rows. """
+        if (orientation == QtCore.Qt.Vertical) and (role == QtCore.Qt.DisplayRole):
+            return QtCore.QVariant(str(section + 1))
+        if self.sourceModel() is None:
+            return QtCore.QVariant()
+        return self.sourceModel().headerData(section, orientation, role)
+
+
 class ToolboxEditableQTableView( QtWidgets.QTableView):  
     """ Customized QTableView for editing. The table is automatically connected to an 
         instance of ToolboxEditableTableModel.  """
@@ -129,11 +129,10 @@ class DatasetViewerTool(app_framework.ToolBase):
                     self._tableview.setTableModel(dataset)
                     self._refresh_result_table()
                 elif isinstance(dataset, plankton_core.DatasetNode):
-                    # Tree dataset must be converted to table dataset before viewing.
-                    targetdataset = plankton_core.DatasetTable()
-                    dataset.convert_to_table_dataset(targetdataset)
+                    # Tree dataset is viewed via a table view. No data is copied.
+                    tableview = dataset.create_table_view()
                     #
-                    self._tableview.setTableModel(targetdataset)
+                    self._tableview.setTableModel(tableview)
                     self._refresh_result_table()
                 #
                 # TODO: Remove later. Default alternative used for non toolbox_utils.
@@ -16,6 +16,7 @@ from .dataset_manager import DatasetNode
 from .dataset_manager import VisitNode
 from .dataset_manager import SampleNode
 from .dataset_manager import VariableNode
+from .dataset_manager import DatasetTableView
 
 from .analysis_manager import AnalysisData
 from .analysis_manager import AnalysisPrepare
@@ -42,8 +43,10 @@ from .report_to_datacenter import CreateReportToDataCenter
 from .screening_manager import ScreeningManager
 
 from .species import Species
+from .species import SpeciesLoader
 
 from .dataimport_manager import DataImportManager
+from .dataimport_cache import DataImportCache
 from .dataimport_utils import DataImportUtils
 from .dataimports_format_base import FormatBase
 from .dataimports_parsed_format import ParsedFormat
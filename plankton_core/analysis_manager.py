@@ -206,7 +206,7 @@ class AnalysisData(object):
         #
         for visitnode in self._data.get_children()[:]:
             if nodelevel == 'visit':
-                if key in visitnode.get_data_dict().keys():
+                if visitnode.has_data(key):
                     if str(visitnode.get_data(key)) in selectedcontent:
                         self._data.remove_child(visitnode)
                         continue
@@ -218,7 +218,7 @@ class AnalysisData(object):
             #
             for samplenode in visitnode.get_children()[:]:
                 if nodelevel == 'sample':
-                    if key in samplenode.get_data_dict().keys():
+                    if samplenode.has_data(key):
                         if str(samplenode.get_data(key)) in selectedcontent:
                             visitnode.remove_child(samplenode)
                             continue
@@ -230,7 +230,7 @@ class AnalysisData(object):
                 #
                 for variablenode in samplenode.get_children()[:]:
                     if nodelevel == 'variable':
-                        if key in variablenode.get_data_dict().keys():
+                        if variablenode.has_data(key):
                             if str(variablenode.get_data(key)) in selectedcontent:
                                 samplenode.remove_child(variablenode)
                         else:
@@ -269,13 +269,25 @@ class AnalysisData(object):
         filter_taxon = self._filter['scientific_name']
         filter_trophic_type = self._filter['trophic_type']
         filter_lifestage = self._filter['life_stage']
+        # Visits and variables for selected stations, dates and taxa from the indexes.
+        # The indexes are kept by the analysis dataset and reused for each filtering.
+        selectedvisits = set()
+        stationindex = analysisdata.get_index('station_name')
+        for station in filter_stations:
+            selectedvisits.update(stationindex.get(station, []))
+        datevisits = set()
+        for sampledate, visitnodes in analysisdata.get_index('sample_date').items():
+            if (filter_startdate > sampledate) or (filter_enddate < sampledate):
+                continue
+            datevisits.update(visitnodes)
+        selectedvisits &= datevisits
+        selectedvariables = set()
+        taxonindex = analysisdata.get_index('scientific_name')
+        for taxon in filter_taxon:
+            selectedvariables.update(taxonindex.get(taxon, []))
         #
         for visitnode in analysisdata.get_children():
-            if filter_startdate > visitnode.get_data('sample_date'):
-                continue
-            if filter_enddate < visitnode.get_data('sample_date'):
-                continue
-            if visitnode.get_data('station_name') not in filter_stations:
+            if visitnode not in selectedvisits:
                 continue
             if visitnode.get_data('visit_month') not in filter_visit_months:
                 continue
@@ -299,7 +311,7 @@ class AnalysisData(object):
                 filteredvisit.add_child(filteredsample)    
                 #
                 for variablenode in samplenode.get_children():
-                    if variablenode.get_data('scientific_name') not in filter_taxon:
+                    if variablenode not in selectedvariables:
                         continue
                     #
                     if variablenode.get_data('trophic_type') not in filter_trophic_type:
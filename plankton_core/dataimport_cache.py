@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+# Project: http://plankton-toolbox.org
+# Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import os
+import glob
+import pickle
+import hashlib
+import pathlib
+import threading
+import toolbox_utils
+import plankton_core
+import app_framework
+
+@toolbox_utils.singleton
+class DataImportCache(object):
+    """ 
+    Cache for imported datasets. Unchanged files are not parsed again.
+    The key is based on the file content, the parser file content, import options 
+    and the version of the loaded species files. Cached datasets are stored as 
+    snapshots in the 'import_cache' directory, together with the accumulated 
+    log rows from the import. 
+    The total size is limited. The least recently used datasets are removed first, 
+    the modification time of the cache files is used as last used time.
+    Worker processes only read the cache. New entries are collected and written 
+    by the parent process, see collect_entries() and add_entries().
+    """
+    # Increase when the cached content or the key is changed.
+    _import_cache_version = 1
+    _cache_file_suffix = '.ptbx_import_cache'
+    
+    def __init__(self, max_size_mb = 500):
+        """ max_size_mb = 0: The cache is not used. """
+        plankton_toolbox_data_path = app_framework.ToolboxUserSettings().get_path_to_plankton_toolbox_data()
+        self._cache_directory_path = str(pathlib.Path(plankton_toolbox_data_path, 'import_cache'))
+        self._max_size = max_size_mb * 1024 * 1024
+        self._file_hashes = {} # Key: (file path, size, modification time). Value: Content hash.
+        self._lock = threading.Lock()
+        self._collected_entries = None # List of (key, pickled data) when collecting.
+
+    def get_max_size_mb(self):
+        """ """
+        return self._max_size / (1024 * 1024)
+
+    def set_max_size_mb(self, max_size_mb):
+        """ max_size_mb = 0: The cache is not used. """
+        self._max_size = max_size_mb * 1024 * 1024
+        self._remove_least_recently_used()
+
+    def is_used(self):
+        """ """
+        return self._max_size > 0
+
+    def collect_entries(self):
+        """ New cache entries are collected instead of written to the cache directory. 
+            Used in worker processes. Collected entries are returned by 
+            get_collected_entries() and written by the parent process with add_entries(). """
+        self._collected_entries = []
+
+    def get_collected_entries(self):
+        """ Returns and clears the entries collected since the last call. """
+        entries = self._collected_entries or []
+        if self._collected_entries is not None:
+            self._collected_entries = []
+        return entries
+
+    def add_entries(self, entries):
+        """ Writes entries collected in a worker process. """
+        if not self.is_used():
+            return
+        for key, data in entries:
+            self._write_cache_file(key, lambda cachefile: cachefile.write(data))
+        self._remove_least_recently_used()
+
+    def get_key(self, file_name, parser_file = None, **import_options):
+        """ Returns the cache key for a file. The file content, the parser file content, 
+            the import options and the species data version are used. """
+        keyparts = [self._import_cache_version, 
+                    plankton_core.DatasetNode._snapshot_version, 
+                    self.get_file_hash(file_name), 
+                    self.get_file_hash(parser_file) if parser_file else None, 
+                    sorted(import_options.items()), 
+                    plankton_core.Species().get_data_version()]
+        return hashlib.sha1(repr(keyparts).encode('utf-8')).hexdigest()
+
+    def get_file_hash(self, file_name):
+        """ Content hash. Remembered until the file size or modification time is changed. """
+        filestat = os.stat(file_name)
+        filekey = (os.path.abspath(file_name), filestat.st_size, filestat.st_mtime_ns)
+        filehash = self._file_hashes.get(filekey, None)
+        if filehash is None:
+            hasher = hashlib.sha1()
+            with open(file_name, 'rb') as infile:
+                for block in iter(lambda: infile.read(1024 * 1024), b''):
+                    hasher.update(block)
+            filehash = hasher.hexdigest()
+            self._file_hashes[filekey] = filehash
+        return filehash
+
+    def import_dataset(self, import_function, file_name, parser_file = None, **import_options):
+        """ Returns the cached dataset if available. Otherwise import_function() is called 
+            without arguments and the returned dataset is added to the cache. 
+            Log rows accumulated during the import are stored and added to the log again 
+            when the cached dataset is used. 
+            Note: The returned dataset is added to the cache before the caller changes it. """
+        if not self.is_used():
+            return import_function()
+        key = self.get_key(file_name, parser_file, **import_options)
+        datasetnode = self._load_dataset(key)
+        if datasetnode is not None:
+            return datasetnode
+        rowsbefore = toolbox_utils.Logging().get_accumulated_rows()
+        datasetnode = import_function()
+        rowsafter = toolbox_utils.Logging().get_accumulated_rows()
+        self._save_dataset(key, datasetnode, self._get_added_rows(rowsbefore, rowsafter))
+        return datasetnode
+
+    def _load_dataset(self, key):
+        """ Returns a new dataset, or None if not cached. """
+        cachefilepath = self._get_cache_file_path(key)
+        try:
+            with open(cachefilepath, 'rb') as cachefile:
+                cached = pickle.load(cachefile)
+            datasetnode = plankton_core.DatasetNode()
+            datasetnode.set_snapshot(cached['snapshot'], cachefilepath)
+            # Used as last used time.
+            os.utime(cachefilepath)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            toolbox_utils.Logging().warning('Failed to read import cache, file will be imported: ' + str(e))
+            return None
+        toolbox_utils.Logging().add_accumulated_rows(cached['accumulated_rows'])
+        toolbox_utils.Logging().info('Dataset loaded from import cache.')
+        return datasetnode
+
+    def _save_dataset(self, key, dataset_node, accumulated_rows):
+        """ Pickled directly when collecting entries, since the caller may change the dataset. """
+        cached = {'snapshot': dataset_node.get_snapshot(), 
+                  'accumulated_rows': accumulated_rows, 
+                  }
+        protocol = min(5, pickle.HIGHEST_PROTOCOL)
+        if self._collected_entries is not None:
+            self._collected_entries.append((key, pickle.dumps(cached, protocol = protocol)))
+            return
+        if self._write_cache_file(key, lambda cachefile: pickle.dump(cached, cachefile, protocol = protocol)):
+            self._remove_least_recently_used()
+
+    def _write_cache_file(self, key, write_function):
+        """ Written to a temporary file first. The cache file is replaced when completed. 
+            Returns False if the file could not be written. """
+        cachefilepath = self._get_cache_file_path(key)
+        tmpfilepath = cachefilepath + '.' + str(os.getpid()) + '.tmp'
+        try:
+            if not os.path.exists(self._cache_directory_path):
+                os.makedirs(self._cache_directory_path, exist_ok = True)
+            with open(tmpfilepath, 'wb') as cachefile:
+                write_function(cachefile)
+            os.replace(tmpfilepath, cachefilepath)
+        except Exception as e:
+            toolbox_utils.Logging().warning('Failed to write import cache: ' + str(e))
+            self._remove_file(tmpfilepath)
+            return False
+        return True
+
+    def clear(self):
+        """ Removes all cached datasets. """
+        with self._lock:
+            for cachefilepath in self._get_cache_file_paths():
+                self._remove_file(cachefilepath)
+        self._file_hashes = {}
+
+    def _get_cache_file_path(self, key):
+        """ """
+        return str(pathlib.Path(self._cache_directory_path, key + self._cache_file_suffix))
+
+    def _get_cache_file_paths(self):
+        """ """
+        return glob.glob(str(pathlib.Path(self._cache_directory_path, '*' + self._cache_file_suffix)))
+
+    def _remove_least_recently_used(self):
+        """ Removes cache files until the total size is below the limit. 
+            Not done when collecting entries, the parent process removes files. """
+        if self._collected_entries is not None:
+            return
+        with self._lock:
+            cachefiles = []
+            for cachefilepath in self._get_cache_file_paths():
+                try:
+                    filestat = os.stat(cachefilepath)
+                except OSError:
+                    continue # Removed by another process.
+                cachefiles.append((filestat.st_mtime_ns, filestat.st_size, cachefilepath))
+            totalsize = sum(size for _mtime, size, _path in cachefiles)
+            for _mtime, size, cachefilepath in sorted(cachefiles):
+                if totalsize <= self._max_size:
+                    break
+                self._remove_file(cachefilepath)
+                totalsize -= size
+
+    def _remove_file(self, file_path):
+        """ """
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass # Removed by another process.
+
+    def _get_added_rows(self, rows_before, rows_after):
+        """ Returns the accumulated log rows added between two calls to 
+            Logging().get_accumulated_rows(). """
+        added = {}
+        for rowtype in ['info', 'warning', 'error']:
+            before = rows_before.get(rowtype, {})
+            added[rowtype] = {message: count - before.get(message, 0) 
+                              for message, count in rows_after.get(rowtype, {}).items() 
+                              if count > before.get(message, 0)}
+        added['warning_item'] = {}
+        for message, items in rows_after.get('warning_item', {}).items():
+            beforeitems = rows_before.get('warning_item', {}).get(message, {})
+            addeditems = {item: count - beforeitems.get(item, 0) 
+                          for item, count in items.items() 
+                          if count > beforeitems.get(item, 0)}
+            if addeditems:
+                added['warning_item'][message] = addeditems
+        return added
@@ -4,12 +4,22 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
+import os
+import multiprocessing
+import concurrent.futures
+import concurrent.futures.process # For BrokenProcessPool.
 import toolbox_utils
 import plankton_core
 
 @toolbox_utils.singleton
 class DataImportManager(object):
-    """ """
+    """ 
+    Import formats:
+    - 'SHARKweb', 'PlanktonCounterExcel' and 'Snapshot': Uses filename.
+    - 'PlanktonCounter': Uses dataset_name and sample_name.
+    - 'ParsedText' and 'ParsedExcel': Uses filename, parser_file, import_column and 
+      export_column. The text_file_encoding is used for text files.
+    """
     def __init__(self):
         """ """
 
@@ -17,27 +27,168 @@ class DataImportManager(object):
                             dataset_name = None, 
                             sample_name = None, 
                             import_format = None,
-                            update_trophic_type = False):
+                            update_trophic_type = False, 
+                            parser_file = None, 
+                            import_column = None, 
+                            export_column = None, 
+                            text_file_encoding = None):
         """ """
+        datasettopnode = self._create_dataset(filename = filename, 
+                                              dataset_name = dataset_name, 
+                                              sample_name = sample_name, 
+                                              import_format = import_format, 
+                                              update_trophic_type = update_trophic_type, 
+                                              parser_file = parser_file, 
+                                              import_column = import_column, 
+                                              export_column = export_column, 
+                                              text_file_encoding = text_file_encoding)
+        if datasettopnode:
+            plankton_core.Datasets().add_dataset(datasettopnode)
+        #
+        return datasettopnode
+
+    def import_dataset_files(self, import_jobs, max_workers = None, progress_callback = None):
+        """ Imports multiple files. Files are parsed concurrently in a process pool and 
+            the datasets are transferred back as snapshots. 
+            import_jobs: List of dictionaries with keyword arguments for import_dataset_file(). 
+            progress_callback: Optional, called as progress_callback(job_index, dataset_node) 
+            when each dataset has been added. 
+            Datasets are added and returned in the same order as the jobs, and contain the 
+            same data as when imported one by one. Accumulated log rows from the workers are 
+            added to the log. If an import fails, the datasets for the previous jobs are kept 
+            and the exception is raised. 
+            Workers are started with 'spawn' on all platforms, a process with Qt and running 
+            threads is not forked. Workers load the species lists from the species cache and 
+            only read the import cache, new import cache entries are written in this process. 
+            max_workers = None: Number of CPUs. Files are imported in this process if only 
+            one worker is used or if the process pool can't be started. """
+        import_jobs = list(import_jobs)
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(import_jobs))
+        datasetnodes = []
+        if max_workers > 1:
+            # Load species lists before the workers are started. The species cache 
+            # is written here and used by the workers.
+            plankton_core.Species()
+            executor = None
+            futures = []
+            try:
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers = max_workers, 
+                            mp_context = multiprocessing.get_context('spawn'), 
+                            initializer = _init_import_worker, 
+                            initargs = (plankton_core.DataImportCache().get_max_size_mb(),))
+                for import_job in import_jobs:
+                    futures.append(executor.submit(_import_dataset_file, import_job))
+            except (OSError, concurrent.futures.process.BrokenProcessPool):
+                # The process pool can't be started. All files are imported below instead.
+                for future in futures:
+                    future.cancel()
+                if executor is not None:
+                    executor.shutdown()
+                executor = None
+            if executor is not None:
+                with executor:
+                    try:
+                        for future in futures:
+                            try:
+                                result = future.result()
+                            except concurrent.futures.process.BrokenProcessPool:
+                                break # A worker process has stopped. Remaining files are imported below.
+                            # Other exceptions from the import job are raised here.
+                            snapshot, accumulatedrows, logrows, cacheentries = result
+                            plankton_core.DataImportCache().add_entries(cacheentries)
+                            toolbox_utils.Logging().log_formatted_rows(logrows)
+                            toolbox_utils.Logging().add_accumulated_rows(accumulatedrows)
+                            datasettopnode = plankton_core.DatasetNode()
+                            datasettopnode.set_snapshot(snapshot)
+                            plankton_core.Datasets().add_dataset(datasettopnode)
+                            datasetnodes.append(datasettopnode)
+                            if progress_callback:
+                                progress_callback(len(datasetnodes) - 1, datasettopnode)
+                    finally:
+                        for future in futures:
+                            future.cancel()
+        # Files are imported one by one.
+        for job_index in range(len(datasetnodes), len(import_jobs)):
+            datasettopnode = self.import_dataset_file(**import_jobs[job_index])
+            datasetnodes.append(datasettopnode)
+            if progress_callback:
+                progress_callback(job_index, datasettopnode)
+        #
+        return datasetnodes
+
+    def _create_dataset(self, filename = None,
+                        dataset_name = None, 
+                        sample_name = None, 
+                        import_format = None,
+                        update_trophic_type = False, 
+                        parser_file = None, 
+                        import_column = None, 
+                        export_column = None, 
+                        text_file_encoding = None):
+        """ Creates the dataset without adding it to the dataset list. """
         datasettopnode = plankton_core.DatasetNode()
         #
         if import_format == 'SHARKweb':
-            self._import_sharkweb_file(datasettopnode, filename, update_trophic_type)
+            # Unchanged files are not parsed again.
+            datasettopnode = plankton_core.DataImportCache().import_dataset(
+                        lambda: self._import_sharkweb_file(filename, update_trophic_type), 
+                        filename, 
+                        import_format = import_format, 
+                        update_trophic_type = update_trophic_type)
 #         if import_format == 'PhytoWin':
 #             self._import_phytowin_file(datasettopnode, filename)
         if import_format == 'PlanktonCounter':
             self._import_plankton_counter_sample(datasettopnode, dataset_name, sample_name, update_trophic_type)
         #        
         if import_format == 'PlanktonCounterExcel':
-            self._import_plankton_counter_sample_from_excel(datasettopnode, filename, update_trophic_type)
+            # Unchanged files are not parsed again.
+            datasettopnode = plankton_core.DataImportCache().import_dataset(
+                        lambda: self._import_plankton_counter_sample_from_excel(filename, update_trophic_type), 
+                        filename, 
+                        import_format = import_format, 
+                        update_trophic_type = update_trophic_type)
         #        
-        if datasettopnode:
-            plankton_core.Datasets().add_dataset(datasettopnode)
+        if import_format == 'Snapshot':
+            # Binary snapshot, already parsed. Created by DatasetNode.save_snapshot().
+            datasettopnode.load_snapshot(filename)
+        #        
+        if import_format == 'ParsedText':
+            importmanager = plankton_core.ImportManager(parser_file, import_column, export_column)
+            datasettopnode = importmanager.import_text_file(filename, text_file_encoding)
+            self._update_trophic_types(datasettopnode, update_trophic_type)
+        #        
+        if import_format == 'ParsedExcel':
+            importmanager = plankton_core.ImportManager(parser_file, import_column, export_column)
+            datasettopnode = importmanager.import_excel_file(filename)
+            self._update_trophic_types(datasettopnode, update_trophic_type)
         #
         return datasettopnode
+
+    def _update_trophic_types(self, dataset_top_node, update_trophic_type):
+        """ Trophic types from the species lists are used if update_trophic_type is set. 
+            Empty trophic types are replaced by 'NS' (Not specified). """
+        for visit in dataset_top_node.get_children():
+            for sample in visit.get_children():
+                for variable in sample.get_children():
+                    trophic_type = variable.get_data('trophic_type', '')
+                    # Update all trophic_types.
+                    if update_trophic_type:
+                        scientific_name = variable.get_data('scientific_name', '')
+                        size_class = variable.get_data('size_class', '')
+                        trophic_type = plankton_core.Species().get_bvol_value(scientific_name, size_class, 'trophic_type')
+                        if trophic_type:
+                            variable.add_data('trophic_type', trophic_type) # Use existing if not in local list.
+                    # Replace empty with NS=Not specified.
+                    if not trophic_type:
+                        variable.add_data('trophic_type', 'NS')
         
-    def _import_sharkweb_file(self, dataset_top_node, file_name, update_trophic_type):
+    def _import_sharkweb_file(self, file_name, update_trophic_type):
         """ """
+        dataset_top_node = plankton_core.DatasetNode()
+        # Large datasets. Store variable data in columns to save memory. 
+        dataset_top_node.use_columnar_storage()
         # Create dataset from file content.
         sharkweb = plankton_core.ImportSharkWeb()
         sharkweb.read_file(file_name)
@@ -46,6 +197,8 @@ class DataImportManager(object):
         # Add export info to dataset.
         columnsinfo = sharkweb.create_export_table_info()
         dataset_top_node.set_export_table_columns(columnsinfo)
+        #
+        return dataset_top_node
 
 #     def _import_phytowin_file(self, dataset_top_node, file_name):
 #         """ """
@@ -71,8 +224,9 @@ class DataImportManager(object):
         columnsinfo = counter.create_export_table_info()
         dataset_top_node.set_export_table_columns(columnsinfo)
 
-    def _import_plankton_counter_sample_from_excel(self, dataset_top_node, excel_file_path, update_trophic_type):
+    def _import_plankton_counter_sample_from_excel(self, excel_file_path, update_trophic_type):
         """ """
+        dataset_top_node = plankton_core.DatasetNode()
         # Create dataset from file content.
         counter = plankton_core.ImportPlanktonCounter()
         counter.read_excel_file(excel_file_path)
@@ -81,5 +235,40 @@ class DataImportManager(object):
         # Add export info to dataset.
         columnsinfo = counter.create_export_table_info()
         dataset_top_node.set_export_table_columns(columnsinfo)
+        #
+        return dataset_top_node
+
+
+class _WorkerLogTarget(object):
+    """ Collects log rows in worker processes. """
+    def __init__(self):
+        """ """
+        self.log_rows = []
+
+    def write_to_log(self, message):
+        """ """
+        self.log_rows.append(message)
+
+
+def _init_import_worker(import_cache_max_size_mb):
+    """ Used by import_dataset_files(). Called once when a worker process is started. 
+        Species lists are loaded from the species cache, log rows are not used. 
+        The import cache is only read, new entries are returned to the parent process. """
+    toolbox_utils.Logging().set_log_target(_WorkerLogTarget())
+    plankton_core.Species()
+    plankton_core.DataImportCache().collect_entries()
+    plankton_core.DataImportCache().set_max_size_mb(import_cache_max_size_mb)
 
 
+def _import_dataset_file(import_job):
+    """ Used by import_dataset_files(). Module level function, called in worker processes. 
+        Returns the dataset snapshot, accumulated log rows, other log rows and 
+        new import cache entries. """
+    logtarget = _WorkerLogTarget()
+    toolbox_utils.Logging().set_log_target(logtarget)
+    toolbox_utils.Logging().start_accumulated_logging()
+    datasettopnode = DataImportManager()._create_dataset(**import_job)
+    return (datasettopnode.get_snapshot(), 
+            toolbox_utils.Logging().get_accumulated_rows(), 
+            logtarget.log_rows, 
+            plankton_core.DataImportCache().get_collected_entries())
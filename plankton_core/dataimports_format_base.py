@@ -15,11 +15,17 @@ class FormatBase(object):
         #
         self._dataset = None
         self._header = []
+        self._header_index = {} # Column name to index in header.
         self._row = None
 
     def _set_header(self, header):
         """ """
         self._header = header
+        # Same as header.index(), first column used if names are duplicated.
+        self._header_index = {}
+        for index, column_name in enumerate(header):
+            if column_name not in self._header_index:
+                self._header_index[column_name] = index
 
     def _set_row(self, row):
         """ """
@@ -4,7 +4,7 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
-import toolbox_utils
+import toolbox_utils
 import plankton_core
 
 class FormatSingleFile(plankton_core.ParsedFormat):
@@ -15,17 +15,18 @@ class FormatSingleFile(plankton_core.ParsedFormat):
 
     def parse_table_dataset(self, dataset, imported_table):
         """ """
+        self.parse_rows(dataset, imported_table.get_header(), imported_table.get_rows())
+
+    def parse_rows(self, dataset, header, rows):
+        """ Rows can be any iterable, i.e. TableFileReader.iterate_rows(). Rows are 
+            consumed one at a time and added to the tree dataset. 
+            Returns the number of parsed rows. """
         self._dataset = dataset        
         #        
         datasetparserrows = dataset.get_dataset_parser_rows()
         #
-#         visitkeycommand = None
-#         samplekeycommand = None
-#         variablekeycommand = None
-        self.visit_key_parts = None
-        self.sample_key_parts = None
-
-
+        visitkeycommand = None
+        samplekeycommand = None
         #
         try:
             for parserrow in datasetparserrows:
@@ -51,9 +52,9 @@ class FormatSingleFile(plankton_core.ParsedFormat):
                         self.append_parser_command(commandstring)
                     #
                     elif (parsernode == 'info') and (parserkey == 'visit_key'):
-                        self.visit_key_parts = 'self.visit_keystring = ' + parsercommand
+                        visitkeycommand = parsercommand
                     elif (parsernode == 'info') and (parserkey == 'sample_key'):
-                        self.sample_key_parts = 'self.sample_keystring = ' + parsercommand
+                        samplekeycommand = parsercommand
                     #
                     elif parsernode == 'function_dataset':
                         commandstring = parserkey + parsercommand
@@ -75,44 +76,108 @@ class FormatSingleFile(plankton_core.ParsedFormat):
         #
         try:
             # Base class must know header for _asText(), etc.
-            self._set_header(imported_table.get_header())
-            # Iterate over rows in imported_table.            
-            for row in imported_table.get_rows():
-                    # Current row to base class.
-                    self._set_row(row) 
-                    # === Get or create nodes. ===
-                    currentvisit = None
-                    currentsample = None
-                    currentvariable = None
-                    # Check if visit exists. Create or reuse.
-                    self.visit_keystring = None
-                    exec(self.visit_key_parts) # Command assigns keystring.
-                    currentvisit = dataset.get_visit_lookup(self.visit_keystring)
-                    if not currentvisit:
-                        currentvisit = plankton_core.VisitNode()
-                        dataset.add_child(currentvisit)    
-                        currentvisit.set_id_string(self.visit_keystring)
-                    # Check if sample exists. Create or reuse.
-                    self.sample_keystring = None
-                    exec(self.sample_key_parts) # Command assigns keystring.
-                    currentsample = dataset.get_sample_lookup(self.sample_keystring)
-                    if not currentsample:
-                        currentsample = plankton_core.SampleNode()
-                        currentvisit.add_child(currentsample)    
-                        currentsample.set_id_string(self.sample_keystring)    
-                    # Add all variables in row.
-                    currentvariable = plankton_core.VariableNode()
-                    currentsample.add_child(currentvariable)    
-                    # === Parse row and add fields on nodes. ===
-                    
-                    for cmd in self._parsercommands:
-                        try:
-                            exec(cmd['command'])
-                        
-                        except Exception as e:
-                            toolbox_utils.Logging().warning('Failed to parse command: %s' % (e.args[0]) + 
-                                                        "- Command string: %s" % (cmd['command_string']))
+            self._set_header(header)
+            # One generated function for all parser commands. Compiled once per import.
+            row_parser = self.compile_row_parser(visitkeycommand, samplekeycommand)
         #
         except Exception as e:
             toolbox_utils.Logging().warning('Failed to parse dataset: %s' % (e.args[0]))
+            return 0
+        # Iterate over rows. Errors when reading rows are raised to the caller.            
+        rowcount = 0
+        for row in rows:
+            try:
+                row_parser(dataset, row)
+                rowcount += 1
+            except Exception as e:
+                toolbox_utils.Logging().warning('Failed to parse dataset: %s' % (e.args[0]))
+                break
+        #
+        return rowcount
 
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. Checks that datasets are the same as when parser commands 
+        were executed with exec() for each row, before the row parser was generated. 
+        Run from the toolbox directory: python -m plankton_core.dataimports_format_singlefile
+    """
+    parser_rows = [{'node': 'info', 'key': 'visit_key', 'command': '$Text("station") + ":" + $Date("date")'}, 
+                   {'node': 'info', 'key': 'sample_key', 'command': '$Text("station") + ":" + $Date("date") + ":" + $Text("depth")'}, 
+                   {'node': 'dataset', 'key': 'dataset_name', 'command': '"Test"'}, 
+                   {'node': 'visit', 'key': 'station_name', 'view_format': 'text', 'command': 'Column:station'}, 
+                   {'node': 'visit', 'key': 'sample_date', 'view_format': 'sample_date', 'command': 'Column:date'}, 
+                   {'node': 'sample', 'key': 'sample_depth_m', 'view_format': 'float', 'command': 'Column:depth'}, 
+                   {'node': 'variable', 'key': 'scientific_name', 'view_format': 'text', 'command': 'Column:taxon'}, 
+                   {'node': 'variable', 'key': 'parameter', 'command': '"Abundance"'}, 
+                   {'node': 'variable', 'key': 'value', 'view_format': 'float', 'command': 'Column:abundance'}, 
+                   {'node': 'variable', 'key': 'unit', 'command': '"ind/l"'}, 
+                   {'node': 'variable', 'key': 'counted_units', 'view_format': 'integer', 'command': 'Column:count'}, 
+                   {'node': 'function_variable', 'key': '', 
+                    'command': '$CopyVariable(p="Biovolume concentration", v=$Float("biovolume"), u="mm3/l")'}, 
+                   {'node': 'variable', 'key': 'not_used', 'command': ''}]
+    header = ['station', 'date', 'depth', 'taxon', 'abundance', 'count', 'biovolume']
+    rows = [['BY31', '2000-01-31', '10', 'Chaetoceros', '1,5', '12', '0.1'], 
+            ['BY31', '2000-01-31', '10', 'Dinophysis', '', '3', ''], 
+            ['BY31', '2000-01-31', '20', 'Chaetoceros', 'x', '1.6', '0,2'], 
+            ['BY15', '2000-02-01', '5', 'Skeletonema'], # Short row.
+            ['BY15', '2000-02-01', '5', 'Nodularia', '2', '2', '0.3']]
+    
+    class ExecFormatSingleFile(FormatSingleFile):
+        """ Previous implementation. exec() for the key commands and each command per row. """
+        def compile_row_parser(self, visit_key_command, sample_key_command):
+            """ """
+            visit_key_parts = 'self.visit_keystring = ' + visit_key_command
+            sample_key_parts = 'self.sample_keystring = ' + sample_key_command
+            def row_parser(dataset, row):
+                """ """
+                self._set_row(row) 
+                self.visit_keystring = None
+                exec(visit_key_parts) # Command assigns keystring.
+                currentvisit = dataset.get_visit_lookup(self.visit_keystring)
+                if not currentvisit:
+                    currentvisit = plankton_core.VisitNode()
+                    dataset.add_child(currentvisit)    
+                    currentvisit.set_id_string(self.visit_keystring)
+                self.sample_keystring = None
+                exec(sample_key_parts) # Command assigns keystring.
+                currentsample = dataset.get_sample_lookup(self.sample_keystring)
+                if not currentsample:
+                    currentsample = plankton_core.SampleNode()
+                    currentvisit.add_child(currentsample)    
+                    currentsample.set_id_string(self.sample_keystring)    
+                currentvariable = plankton_core.VariableNode()
+                currentsample.add_child(currentvariable)    
+                for cmd in self._parsercommands:
+                    try:
+                        exec(cmd['command'])
+                    except Exception as e:
+                        toolbox_utils.Logging().warning('Failed to parse command: %s' % (e.args[0]) + 
+                                                        "- Command string: %s" % (cmd['command_string']))
+            return row_parser
+    
+    def get_content(dataset):
+        """ Node data for all nodes, in tree order. """
+        content = [('dataset', dataset.get_data_dict())]
+        for visitnode in dataset.get_children():
+            content.append(('visit', visitnode.get_id_string(), visitnode.get_data_dict()))
+            for samplenode in visitnode.get_children():
+                content.append(('sample', samplenode.get_id_string(), samplenode.get_data_dict()))
+                for variablenode in samplenode.get_children():
+                    content.append(('variable', variablenode.get_data_dict()))
+        return content
+    
+    contents = []
+    for format_class in [ExecFormatSingleFile, FormatSingleFile]:
+        dataset = plankton_core.DatasetNode()
+        dataset.set_dataset_parser_rows(parser_rows)
+        rowcount = format_class().parse_rows(dataset, header, iter(rows))
+        contents.append(get_content(dataset))
+        print(format_class.__name__ + ': Rows: ' + str(rowcount) + ', nodes: ' + str(len(contents[-1])))
+    print('Equal datasets: ' + str(contents[0] == contents[1]))
+    for execnode, rowparsernode in zip(contents[0], contents[1]):
+        if execnode != rowparsernode:
+            print('- Exec:       ' + str(execnode))
+            print('- Row parser: ' + str(rowparsernode))
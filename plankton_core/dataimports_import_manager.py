@@ -4,7 +4,9 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
-import toolbox_utils
+import sys
+import time
+import toolbox_utils
 import plankton_core
 
 class ImportManager(object):
@@ -35,6 +37,27 @@ class ImportManager(object):
         self._load_parser_info()
 
     def import_text_file(self, filename, textfile_encoding):
+        """ Unchanged files are not parsed again, see DataImportCache. """
+        return plankton_core.DataImportCache().import_dataset(
+                    lambda: self._import_text_file(filename, textfile_encoding), 
+                    filename, 
+                    parser_file = self._parser_file_path, 
+                    import_format = 'text', 
+                    import_column = self._import_column, 
+                    export_column = self._export_column, 
+                    textfile_encoding = textfile_encoding)
+
+    def import_excel_file(self, filename):
+        """ Unchanged files are not parsed again, see DataImportCache. """
+        return plankton_core.DataImportCache().import_dataset(
+                    lambda: self._import_excel_file(filename), 
+                    filename, 
+                    parser_file = self._parser_file_path, 
+                    import_format = 'excel', 
+                    import_column = self._import_column, 
+                    export_column = self._export_column)
+
+    def _import_text_file(self, filename, textfile_encoding):
         """ """
         # Select import format.
         formatparser = plankton_core.FormatSingleFile()
@@ -53,25 +76,32 @@ class ImportManager(object):
                     datarowsfrom = int(float(rowdict.get('command', '2').replace(',', '.')))
                     if datarowsfrom: datarowsfrom -= 1
 
+        # Rows are streamed from the file to the parser, one at a time.
+        # Only columns used in the parser are loaded.
+        starttime = time.time()
         tablefilereader = toolbox_utils.TableFileReader(text_file_name = filename, 
+                                                 select_columns_by_name = self._get_used_column_names(),
                                                  encoding = textfile_encoding,
                                                  header_row = headerrow,
-                                                 data_rows_from = datarowsfrom)
-        tabledataset = plankton_core.DatasetTable()
-        tabledataset.set_header(tablefilereader.header())
-        for row in tablefilereader.rows():
-            tabledataset.append_row(row)
+                                                 data_rows_from = datarowsfrom, 
+                                                 stream_rows = True)
         #
         toolbox_utils.Logging().info('Loading file. Header content: ' +  
-                                 str(tabledataset.get_header()))
+                                 str(tablefilereader.header()))
         
-        # Phase 2: Parse the table and create a corresponding tree structure.
+        # Phase 2: Parse the rows and create a corresponding tree structure.
         targetdataset = plankton_core.DatasetNode()
         #
         targetdataset.set_dataset_parser_rows(self._importrows)
         targetdataset.set_export_table_columns(self._columnsinfo)
         #
-        formatparser.parse_table_dataset(targetdataset, tabledataset)
+        try:
+            rowcount = formatparser.parse_rows(targetdataset, 
+                                               tablefilereader.header(), 
+                                               tablefilereader.iterate_rows())
+            self._log_column_projection(tablefilereader, rowcount, time.time() - starttime)
+        finally:
+            tablefilereader.clear()
         # Phase 3: Reorganize between nodes in tree structure.
         formatparser.reorganize_dataset()
         # Phase 4: Reformat fields in tree structure.
@@ -81,7 +111,7 @@ class ImportManager(object):
         #
         return targetdataset
 
-    def import_excel_file(self, filename):
+    def _import_excel_file(self, filename):
         """ """
         # Select import format.
         formatparser = plankton_core.FormatSingleFile()
@@ -112,25 +142,32 @@ class ImportManager(object):
 #                    datarowsfrom = toolbox_utils.ViewFormats().format(rowdict.get('Command', '2'), 'Integer')
 #                    if datarowsfrom: datarowsfrom -= 1
         
+        # Rows are streamed from the file to the parser, one at a time.
+        # Only columns used in the parser are loaded.
+        starttime = time.time()
         tablefilereader = toolbox_utils.TableFileReader(excel_file_name = filename,
+                                                  select_columns_by_name = self._get_used_column_names(),
                                                   excel_sheet_name = sheetname,
                                                   header_row = headerrow,
-                                                  data_rows_from = datarowsfrom)
-        tabledataset = plankton_core.DatasetTable()
-        tabledataset.set_header(tablefilereader.header())
-        for row in tablefilereader.rows():
-            tabledataset.append_row(row)
+                                                  data_rows_from = datarowsfrom, 
+                                                  stream_rows = True)
         #
         toolbox_utils.Logging().info('Loading file. Header content: ' +  
-                                 str(tabledataset.get_header()))
+                                 str(tablefilereader.header()))
 
-        # Phase 2: Parse the table and create a corresponding tree structure.
+        # Phase 2: Parse the rows and create a corresponding tree structure.
         targetdataset = plankton_core.DatasetNode()
         #
         targetdataset.set_dataset_parser_rows(self._importrows)
         targetdataset.set_export_table_columns(self._columnsinfo)
         #
-        formatparser.parse_table_dataset(targetdataset, tabledataset)
+        try:
+            rowcount = formatparser.parse_rows(targetdataset, 
+                                               tablefilereader.header(), 
+                                               tablefilereader.iterate_rows())
+            self._log_column_projection(tablefilereader, rowcount, time.time() - starttime)
+        finally:
+            tablefilereader.clear()
         # Phase 3: Reorganize between nodes in tree structure.
         formatparser.reorganize_dataset()
         # Phase 4: Reformat fields in tree structure.
@@ -167,6 +204,35 @@ class ImportManager(object):
 #            zipfile.close() # Close zip file.
 #            del zipfile
 
+    def _get_used_column_names(self):
+        """ Columns used in the parser. None means that all columns are loaded. """
+        columnnames = plankton_core.FormatSingleFile().get_used_column_names(self._importrows)
+        if not columnnames:
+            toolbox_utils.Logging().info('Column projection not used. All columns are loaded.')
+            return None
+        return columnnames
+
+    def _log_column_projection(self, table_file_reader, row_count, elapsed_seconds):
+        """ Reports columns and fields skipped when reading the file, compared with 
+            a full load of all columns. The memory saved is a lower bound, one empty 
+            string and one list item for each skipped field. """
+        filecolumns = len(table_file_reader.file_header())
+        usedcolumns = len(table_file_reader.header())
+        if (filecolumns == 0) or (usedcolumns >= filecolumns):
+            return
+        skippedcolumns = filecolumns - usedcolumns
+        skippedfields = skippedcolumns * row_count
+        savedbytes = skippedfields * (sys.getsizeof('') + 8)
+        toolbox_utils.Logging().info('Column projection: ' + str(usedcolumns) + ' of ' + 
+                                     str(filecolumns) + ' columns loaded, ' + 
+                                     str(skippedcolumns) + ' columns skipped. ' + 
+                                     str(skippedfields) + ' fields (' + 
+                                     str(int(100 * skippedcolumns / filecolumns)) + '%) not stored. ' + 
+                                     'Memory saved compared with a full load: at least ' + 
+                                     '%.1f' % (savedbytes / (1024 * 1024)) + ' MB. ' + 
+                                     'Rows: ' + str(row_count) + 
+                                     '. Import time: ' + '%.2f' % elapsed_seconds + ' s.')
+
     def _load_parser_info(self):
         """ """
         # Read dataset parser.
@@ -259,6 +259,8 @@ class ImportPlanktonCounter(plankton_core.DataImportPreparedBase):
     
     def create_tree_dataset(self, dataset_top_node, update_trophic_type):
         """ """
+        # Shared objects for repeated text values.
+        intern_value = dataset_top_node.intern_value
         # Add data to dataset node.
         for parsinginforow in self._parsing_info:
             if parsinginforow[0] == 'dataset':
@@ -302,7 +304,7 @@ class ImportPlanktonCounter(plankton_core.DataImportPreparedBase):
             for parsinginforow in self._parsing_info:
                 if parsinginforow[0] == 'variable':
                     value = self._sample_info.get(parsinginforow[3], '')
-                    variablenode.add_data(parsinginforow[1], value)
+                    variablenode.add_data(parsinginforow[1], intern_value(value))
             
             # Merge data header and row.     
             row_dict = dict(zip(self._sample_header, row))
@@ -333,6 +335,8 @@ class ImportPlanktonCounter(plankton_core.DataImportPreparedBase):
                             value = 'NS'
                     
                     if len(value) > 0: # Don't overwrite from previous step.
+                        if parsinginforow[2] != 'float':
+                            value = intern_value(value)
                         variablenode.add_data(parsinginforow[1], value)
                                        
             # Copy to new variable nodes for parameters.
@@ -4,7 +4,10 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
+import gc
 import codecs
+import operator
+import contextlib
 import toolbox_utils
 import plankton_core
 
@@ -67,6 +70,14 @@ class ImportSharkWeb(plankton_core.DataImportPreparedBase):
         """ """
         self._header = []
         self._rows = []
+        self._clear_columns()
+
+    def _clear_columns(self):
+        """ Column lists and species values used by create_tree_dataset(). """
+        self._columns = {} # Key: column name. Value: list with one value for each row.
+        self._min_row_length = None
+        self._taxon_size_classes = None
+        self._species_info = None
 
     def read_file(self, file_name = None):
         """ """
@@ -89,12 +100,9 @@ class ImportSharkWeb(plankton_core.DataImportPreparedBase):
                 item = headeritem.strip()
                 self._header.append(item)   
             # Read data rows. Continue until empty line occurs.
-            self._rows = []
-            for row in input_file.readlines():
-                rowitems = []
-                for item in row.split(separator):
-                    rowitems.append(item.strip())
-                self._rows.append(rowitems) 
+            with _gc_paused():
+                self._rows = [[item.strip() for item in row.split(separator)] 
+                              for row in input_file.readlines()]
         #                       
         except (IOError, OSError):
             raise
@@ -102,96 +110,314 @@ class ImportSharkWeb(plankton_core.DataImportPreparedBase):
             if input_file: input_file.close()
 
     def create_tree_dataset(self, dataset, update_trophic_type):
-        """ """
+        """ Rows are processed column by column. Column positions are resolved once, 
+            visits and samples are grouped on tuple keys and species related values are 
+            resolved once for each taxon/size class pair. """
         try:
-            # Base class must know header for _asText(), etc.
-#             self._set_header(self._header)
-            # Iterate over rows in imported_table.            
+            self._clear_columns()
+            self._create_tree_dataset(dataset, update_trophic_type)
+        #
+        except Exception as e:
+            toolbox_utils.Logging().warning('Failed to parse dataset: %s' % (e.args[0]))
+        finally:
+            self._clear_columns()
+
+    def _create_tree_dataset(self, dataset, update_trophic_type):
+        """ Private method. Use create_tree_dataset() above. """
+        # Millions of objects may be created.
+        with _gc_paused():
+            # Visits and samples. Values from the last row are used, as when added row by row.
+            # Note: The visit key fields are included in the sample key fields. All rows for 
+            # a sample belong to the same visit.
+            visits = {} # Key: tuple with key field values.
+            samples = {}
+            visitrows = {} # Key: tuple with key field values. Value: last row. Same order as visits.
+            samplerows = {}
+            samplevisitkeys = {} # Key: sample key. Value: visit key.
+            samplenodes = [] # One for each row.
+            visitcolumns = [self._get_column(key_field) for key_field in self._visit_key_fields]
+            samplekeys = zip(*[self._get_column(key_field) for key_field in self._sample_key_fields])
+            for rowindex, samplekey in enumerate(samplekeys):
+                currentsample = samples.get(samplekey, None)
+                if currentsample is None:
+                    # Check if visit exists. Create or reuse.
+                    visitkey = tuple([column[rowindex] for column in visitcolumns])
+                    currentvisit = visits.get(visitkey, None)
+                    if currentvisit is None:
+                        keystring = '<+>'.join(visitkey)
+                        currentvisit = dataset.get_visit_lookup(keystring)
+                        if not currentvisit:
+                            currentvisit = plankton_core.VisitNode()
+                            dataset.add_child(currentvisit)    
+                            currentvisit.set_id_string(keystring)
+                        visits[visitkey] = currentvisit
+                        visitrows[visitkey] = rowindex
+                    samplevisitkeys[samplekey] = visitkey
+                    # Check if sample exists. Create or reuse.
+                    keystring = '<+>'.join(samplekey)
+                    currentsample = dataset.get_sample_lookup(keystring)
+                    if not currentsample:
+                        currentsample = plankton_core.SampleNode()
+                        currentvisit.add_child(currentsample)    
+                        currentsample.set_id_string(keystring)    
+                    samples[samplekey] = currentsample
+                samplerows[samplekey] = rowindex
+                samplenodes.append(currentsample)
+            for samplekey, rowindex in samplerows.items():
+                visitkey = samplevisitkeys[samplekey]
+                if rowindex > visitrows[visitkey]:
+                    visitrows[visitkey] = rowindex
+            # === Parse columns and add fields on nodes. ===                    
+            variablecolumns = []
+            for parsinginforow in self._parsing_info:
+                # Add at right level.
+                if parsinginforow[0] == 'visit':
+                    values = self._get_field_values(parsinginforow, dataset, update_trophic_type, 
+                                                    list(visitrows.values()))
+                    for visitnode, value in zip(visits.values(), values):
+                        visitnode.add_data(parsinginforow[1], value)        
+                #
+                if parsinginforow[0] == 'sample':
+                    values = self._get_field_values(parsinginforow, dataset, update_trophic_type, 
+                                                    list(samplerows.values()))
+                    for samplenode, value in zip(samples.values(), values):
+                        samplenode.add_data(parsinginforow[1], value)        
+                #
+                if parsinginforow[0] == 'variable':
+                    values = self._get_field_values(parsinginforow, dataset, update_trophic_type)
+                    variablecolumns.append((parsinginforow[1], values))
+            # All variables in one call.
+            dataset.add_variables(samplenodes, variablecolumns)
+
+    def _get_field_values(self, parsing_info_row, dataset, update_trophic_type, row_indexes = None):
+        """ Returns a list with one value for each row, or for each row in row_indexes. """
+        def get_column(column_name):
+            """ """
+            return self._get_column(column_name, row_indexes)
+        def get_taxon_size_classes():
+            """ """
+            taxonsizeclasses = self._get_taxon_size_classes()
+            if row_indexes is not None:
+                taxonsizeclasses = [taxonsizeclasses[rowindex] for rowindex in row_indexes]
+            return taxonsizeclasses
+        #
+        key = parsing_info_row[1]
+        viewformat = parsing_info_row[2]
+        values = get_column(parsing_info_row[3])
+        # Fix float.
+        if viewformat == 'float': 
+            values = [value.replace(',', '.') for value in values]
+        # Calculate some values.
+        if key == 'visit_month':
+            values = [value[5:7] for value in get_column('sample_date')]
+        if key == 'plankton_group':
+            speciesinfo = self._get_species_info()
+            values = [speciesinfo[taxonsizeclass]['plankton_group'] 
+                      for taxonsizeclass in get_taxon_size_classes()]
+        if key == 'analysed_by':
+            values = [value or taxonomist 
+                      for value, taxonomist in zip(values, get_column('taxonomist'))]
+        if key == 'trophic_type':
+            # Update trophic_type.
+            if update_trophic_type:
+                speciesinfo = self._get_species_info()
+                # Use existing if not in local list.
+                values = [speciesinfo[taxonsizeclass]['size_class_trophic_type'] or value 
+                          for value, taxonsizeclass in zip(values, get_taxon_size_classes())]
+            # Replace empty with NS=Not specified.
+            values = [value or 'NS' for value in values]
+        # Text, dates and codes are often repeated. 
+        if viewformat != 'float':
+            values = dataset.intern_values(values)
+        return values
+
+    def _get_column(self, column_name, row_indexes = None):
+        """ Returns a list with one value for each row, or for each row in row_indexes. 
+            Empty strings if the column is missing. If column names are duplicated, the 
+            last column is used. Full columns are kept until the import is finished. """
+        values = self._columns.get(column_name, None)
+        if values is not None:
+            if row_indexes is not None:
+                values = [values[rowindex] for rowindex in row_indexes]
+            return values
+        #
+        rows = self._rows
+        if row_indexes is not None:
+            rows = [rows[rowindex] for rowindex in row_indexes]
+        elif (not self._columns) and rows and (self._get_min_row_length() >= len(self._header)):
+            # All columns in one pass. Faster than one pass over the rows for each column.
+            usedcolumns = set(self._visit_key_fields + self._sample_key_fields + 
+                              [parsinginforow[3] for parsinginforow in self._parsing_info] + 
+                              ['sample_date', 'taxonomist', 'scientific_name', 'size_class'])
+            for headeritem, columnvalues in zip(self._header, zip(*rows)):
+                if headeritem in usedcolumns:
+                    self._columns[headeritem] = columnvalues # Duplicated columns: Last is used.
+            return self._columns.get(column_name, None) or [''] * len(rows)
+        columnindex = None
+        for index, headeritem in enumerate(self._header):
+            if headeritem == column_name:
+                columnindex = index
+        if columnindex is None:
+            values = [''] * len(rows)
+        elif columnindex < self._get_min_row_length():
+            values = list(map(operator.itemgetter(columnindex), rows))
+        else:
+            # Short rows. Same as dict(zip(header, row)).get(column_name, '').
+            values = [row[columnindex] if columnindex < len(row) else dict(zip(self._header, row)).get(column_name, '') 
+                      for row in rows]
+        if row_indexes is None:
+            self._columns[column_name] = values
+        return values
+
+    def _get_min_row_length(self):
+        """ """
+        if self._min_row_length is None:
+            self._min_row_length = min(map(len, self._rows)) if self._rows else 0
+        return self._min_row_length
+
+    def _get_taxon_size_classes(self):
+        """ Returns a list with one (scientific_name, size_class) tuple for each row. """
+        if self._taxon_size_classes is None:
+            self._taxon_size_classes = list(zip(self._get_column('scientific_name'), 
+                                                self._get_column('size_class')))
+        return self._taxon_size_classes
+
+    def _get_species_info(self):
+        """ Species values for all taxon/size class pairs in the file. """
+        if self._species_info is None:
+            self._species_info = plankton_core.Species().enrich_batch(set(self._get_taxon_size_classes()), 
+                                                                      ['plankton_group', 'size_class_trophic_type'])
+        return self._species_info
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """ The cyclic garbage collector is paused when many objects are created. 
+        Otherwise all objects are traversed again and again during the import. """
+    gcenabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gcenabled:
+            gc.enable()
+
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. Checks that the column based import creates the same dataset 
+        as the previous row by row implementation. Species values are not loaded. 
+        Run from the toolbox directory: python -m plankton_core.dataimports_sharkweb
+    """
+    import collections
+    
+    header = ['visit_year', 'sample_date', 'station_name', 'sample_latitude_dd', 'sample_longitude_dd', 
+              'sample_id', 'sample_min_depth_m', 'sample_max_depth_m', 'scientific_name', 'size_class', 
+              'trophic_type_code', 'parameter', 'value', 'unit', 'analysed_by', 'taxonomist', 'unit']
+    rows = [['2000', '2000-06-01', 'BY31', '58,5', '20,1', 'S1', '0', '10', 'Chaetoceros', '1', 
+             'AU', 'Abundance', '1,5', 'cells', '', 'Tax A', 'ind/l'], 
+            ['2000', '2000-06-01', 'BY31', '58,6', '20,1', 'S2', '10', '20', 'Dinophysis', '', 
+             '', 'Abundance', '3', 'ind/l', 'Analyst', 'Tax A', 'ind/l'], 
+            ['2000', '2000-06-02', 'BY15', '57.3', '20.0', 'S3', '0', '10', 'Nodularia', '2', 
+             '', 'Biovolume', '0.2', 'mm3/l', '', '', 'mm3/l'], 
+            # Same visit and sample as the first row, not in sequence. Last values are used.
+            ['2000', '2000-06-01', 'BY31', '58,7', '20,2', 'S1', '0', '10', 'Dinophysis', '', 
+             'MX', 'Abundance', '4', 'ind/l', '', 'Tax B', 'ind/l'], 
+            # Short row.
+            ['2000', '2000-06-02', 'BY15', '57.3', '20.0', 'S3', '0', '10', 'Skeletonema']]
+    # Species values for (scientific_name, size_class).
+    speciesinfo = collections.defaultdict(lambda: {'plankton_group': '', 'size_class_trophic_type': ''})
+    speciesinfo[('Chaetoceros', '1')] = {'plankton_group': 'Diatoms', 'size_class_trophic_type': 'AU'}
+    speciesinfo[('Dinophysis', '')] = {'plankton_group': 'Dinoflagellates', 'size_class_trophic_type': 'MX'}
+    speciesinfo[('Nodularia', '2')] = {'plankton_group': 'Cyanobacteria', 'size_class_trophic_type': ''}
+    
+    class TestImportSharkWeb(ImportSharkWeb):
+        """ """
+        def _get_species_info(self):
+            """ """
+            return speciesinfo
+    
+    class RowByRowImportSharkWeb(TestImportSharkWeb):
+        """ Previous implementation. One dictionary and string keys for each row. """
+        def create_tree_dataset(self, dataset, update_trophic_type):
+            """ """
+            intern_value = dataset.intern_value
+            speciesinfo = self._get_species_info()
             for row in self._rows:
                 row_dict = dict(zip(self._header, row))
-                # Get or create nodes. 
-                currentvisit = None
-                currentsample = None
-                currentvariable = None
-                # Check if visit exists. Create or reuse.
-                keystring = ''
-                delimiter = ''
-                for key_field in self._visit_key_fields:
-                    keystring += delimiter + row_dict.get(key_field, '') 
-                    delimiter = '<+>'
-                #
+                keystring = '<+>'.join([row_dict.get(key_field, '') for key_field in self._visit_key_fields])
                 currentvisit = dataset.get_visit_lookup(keystring)
                 if not currentvisit:
                     currentvisit = plankton_core.VisitNode()
                     dataset.add_child(currentvisit)    
                     currentvisit.set_id_string(keystring)
-                # Check if sample exists. Create or reuse.
-                keystring = ''
-                delimiter = ''
-                for key_field in self._sample_key_fields:
-                    keystring += delimiter + row_dict.get(key_field, '') 
-                    delimiter = '<+>'
-                #
+                keystring = '<+>'.join([row_dict.get(key_field, '') for key_field in self._sample_key_fields])
                 currentsample = dataset.get_sample_lookup(keystring)
                 if not currentsample:
                     currentsample = plankton_core.SampleNode()
                     currentvisit.add_child(currentsample)    
                     currentsample.set_id_string(keystring)    
-                # Add all variables in row.
                 currentvariable = plankton_core.VariableNode()
                 currentsample.add_child(currentvariable)    
-                # === Parse row and add fields on nodes. ===                    
                 for parsinginforow in self._parsing_info:
-                    #
                     value = row_dict.get(parsinginforow[3], '')
-                    # Fix float.
                     if parsinginforow[2] == 'float': 
                         value = value.replace(',', '.')
-                    # Calculate some values.
                     if parsinginforow[1] == 'visit_month':
-                        try:
-                            value = row_dict.get('sample_date', '')
-                            value = value[5:7]
-                        except: 
-                            pass        
+                        value = row_dict.get('sample_date', '')[5:7]
                     if parsinginforow[1] == 'plankton_group':
-                        try:
-                            value = row_dict.get('scientific_name', '')
-                            value = plankton_core.Species().get_plankton_group_from_taxon_name(value)
-                        except: 
-                            pass 
+                        value = speciesinfo[(row_dict.get('scientific_name', ''), 
+                                             row_dict.get('size_class', ''))]['plankton_group']
                     if parsinginforow[1] == 'analysed_by':
-                        try:
-                            if not value:
-                                value = row_dict.get('taxonomist', '')
-                        except: 
-                            pass 
+                        if not value:
+                            value = row_dict.get('taxonomist', '')
                     if parsinginforow[1] == 'trophic_type':
-                    
-                    
-                        # Update trophic_type.
-                        if parsinginforow[1] == 'trophic_type':
-                            if update_trophic_type:
-                                scientific_name = row_dict.get('scientific_name', '')
-                                size_class = row_dict.get('size_class', '')
-                                trophic_type = plankton_core.Species().get_bvol_value(scientific_name, size_class, 'trophic_type')
-                                if trophic_type:
-                                    value = trophic_type # Use existing if not in local list.
-                            # Replace empty with NS=Not specified.
-                            if not value:
-                                value = 'NS'
-                    
-                    # Add at right level.
+                        if update_trophic_type:
+                            trophic_type = speciesinfo[(row_dict.get('scientific_name', ''), 
+                                                        row_dict.get('size_class', ''))]['size_class_trophic_type']
+                            if trophic_type:
+                                value = trophic_type
+                        if not value:
+                            value = 'NS'
+                    if parsinginforow[2] != 'float':
+                        value = intern_value(value)
                     if parsinginforow[0] == 'visit':
                         currentvisit.add_data(parsinginforow[1], value)        
-                    #
                     if parsinginforow[0] == 'sample':
                         currentsample.add_data(parsinginforow[1], value)        
-                    #
                     if parsinginforow[0] == 'variable':
                         currentvariable.add_data(parsinginforow[1], value) 
-
-        #
-        except Exception as e:
-            toolbox_utils.Logging().warning('Failed to parse dataset: %s' % (e.args[0]))
-
+    
+    def get_content(dataset):
+        """ Node data for all nodes, in tree order. """
+        content = []
+        for visitnode in dataset.get_children():
+            content.append(('visit', visitnode.get_id_string(), visitnode.get_data_dict()))
+            for samplenode in visitnode.get_children():
+                content.append(('sample', samplenode.get_id_string(), samplenode.get_data_dict()))
+                for variablenode in samplenode.get_children():
+                    content.append(('variable', variablenode.get_data_dict()))
+        return content
+    
+    for updatetrophictype in [False, True]:
+        for columnar in [False, True]:
+            contents = []
+            for import_class in [RowByRowImportSharkWeb, TestImportSharkWeb]:
+                dataset = plankton_core.DatasetNode()
+                if columnar:
+                    dataset.use_columnar_storage()
+                sharkweb = import_class()
+                sharkweb._header = header
+                sharkweb._rows = rows
+                sharkweb.create_tree_dataset(dataset, updatetrophictype)
+                contents.append(get_content(dataset))
+            print('Update trophic type: ' + str(updatetrophictype) + 
+                  ', columnar storage: ' + str(columnar) + 
+                  ', nodes: ' + str(len(contents[0])) + 
+                  ', equal: ' + str(contents[0] == contents[1]))
+            for rowbyrownode, columnnode in zip(contents[0], contents[1]):
+                if rowbyrownode != columnnode:
+                    print('- Row by row: ' + str(rowbyrownode))
+                    print('- Columns:    ' + str(columnnode))
@@ -5,6 +5,7 @@
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
 import copy
+import pickle
 import toolbox_utils
 import plankton_core
 
@@ -160,10 +161,90 @@ Functions and classes below should be used for datasets organized as trees.
 Valid node order in the tree is dataset - visit - sample - variable.
 """
 
+# Marks missing values in VariableColumns. Other values, including None, are valid.
+_MISSING = object()
+
+class VariableColumns(object):
+    """ 
+    Columnar storage for variable data. One list for each key and one row for each variable.
+    Used when DatasetNode.use_columnar_storage() is called. VariableNode objects are then
+    row views and all data is stored here, instead of in one dictionary for each variable.
+    Note: Rows for removed variables are not reused, the memory is released when the 
+    dataset is removed.
+    """
+    def __init__(self):
+        """ """
+        self._columns = {} # Key: list of values, one for each row.
+        self._row_count = 0
+
+    def get_row_count(self):
+        """ """
+        return self._row_count
+
+    def get_keys(self):
+        """ """
+        return list(self._columns.keys())
+
+    def add_row(self):
+        """ Returns the index of the new row. """
+        row = self._row_count
+        self._row_count += 1
+        return row
+
+    def set_value(self, row, key, value):
+        """ """
+        column = self._columns.get(key, None)
+        if column is None:
+            column = []
+            self._columns[key] = column
+        # Columns are extended when used. Keys are not used by all variables.
+        missing = row + 1 - len(column)
+        if missing > 0:
+            column.extend([_MISSING] * missing)
+        column[row] = value
+
+    def get_value(self, row, key, default_value = ''):
+        """ """
+        column = self._columns.get(key, None)
+        if (column is None) or (row >= len(column)):
+            return default_value
+        value = column[row]
+        if value is _MISSING:
+            return default_value
+        return value
+
+    def has_value(self, row, key):
+        """ """
+        column = self._columns.get(key, None)
+        return (column is not None) and (row < len(column)) and (column[row] is not _MISSING)
+
+    def get_row_dict(self, row):
+        """ Returns a new dictionary with all data for the row. """
+        row_dict = {}
+        for key, column in self._columns.items():
+            if row < len(column):
+                value = column[row]
+                if value is not _MISSING:
+                    row_dict[key] = value
+        return row_dict
+
+    def set_row_dict(self, row, data_dict):
+        """ Replaces all data for the row. """
+        for column in self._columns.values():
+            if row < len(column):
+                column[row] = _MISSING
+        for key, value in data_dict.items():
+            if key:
+                self.set_value(row, key, value)
+
+
 class DataNode(object):
     """
     Abstract base class for tree nodes. 
+    Slots are used to save memory, datasets may contain millions of nodes.
     """
+    __slots__ = ('_parent', '_children', '_datadict', '_idstring')
+    
     def __init__(self):
         self._parent = None # Parent node.
         self._children = [] # List of child nodes.
@@ -203,8 +284,17 @@ class DataNode(object):
         """ """
         if child_object in self._children: 
             self._children.remove(child_object)
+            self._invalidate_dataset_indexes()
         else:
             print('DEBUG: Can\'t remove child.')
+
+    def _invalidate_dataset_indexes(self):
+        """ Secondary indexes in the dataset node must be rebuilt when the tree is changed. """
+        node = self
+        while node._parent is not None:
+            node = node._parent
+        if isinstance(node, DatasetNode):
+            node.invalidate_indexes()
         
     def add_data(self, key, value):
         """ """
@@ -218,6 +308,10 @@ class DataNode(object):
         """ """
         return self._datadict.get(key, default_value)
 
+    def has_data(self, key):
+        """ """
+        return key in self._datadict
+
     def get_data_dict(self):
         """ """
         return self._datadict
@@ -239,6 +333,18 @@ class DatasetNode(DatasetBase, DataNode):
     """ This it the top node for tree datasets. 
     Note: Multiple inheritance. DataNode for data and tree structure. DatasetBase for metadata. 
     """
+    # Secondary indexes, created on demand. Index name: (node level, data keys).
+    # Indexes with multiple data keys uses tuples as keys.
+    _index_definitions = {
+        'scientific_name': ('variable', ('scientific_name',)),
+        'parameter_unit': ('variable', ('parameter', 'unit')),
+        'station_name': ('visit', ('station_name',)),
+        'sample_date': ('visit', ('sample_date',)),
+        }
+    # Binary snapshots. The version must be increased when the content is changed.
+    _snapshot_format = 'plankton_toolbox_dataset_snapshot'
+    _snapshot_version = 1
+    
     def __init__(self):
         """ """
 #        self._lookuplist = None        
@@ -253,11 +359,87 @@ class DatasetNode(DatasetBase, DataNode):
         #
         self._datasetparserrows = []
         self._exporttablecolumns = []
+        #
+        self._variable_columns = None # Columnar storage for variables. Optional.
+        self._interned_values = {} # Shared objects for repeated strings.
+        self._indexes = {} # Secondary indexes. Index name: {value: [nodes]}.
+
+    def intern_value(self, value):
+        """ Returns a shared object for equal strings. Used by importers for keys and 
+            categorical values, i.e. station names, parameters, units and taxon names. """
+        if type(value) is str:
+            return self._interned_values.setdefault(value, value)
+        return value
+
+    def intern_values(self, values, sample_size = 1000, max_distinct_share = 0.5):
+        """ As intern_value(), for a column of strings. Returns a new list. 
+            Not interned if most of the first values are distinct, i.e. for id columns 
+            and free text, since that would only add entries to the interned values. """
+        sample = values[:sample_size]
+        if len(set(sample)) > len(sample) * max_distinct_share:
+            return list(values)
+        return list(map(self._interned_values.setdefault, values, values))
+
+    def use_columnar_storage(self):
+        """ Variable data will be stored in one list for each key, instead of one 
+            dictionary for each variable. Must be called before variables are added. """
+        if self._variable_count > 0:
+            raise UserWarning('Columnar storage must be selected before variables are added.')
+        if self._variable_columns is None:
+            self._variable_columns = VariableColumns()
+
+    def get_variable_columns(self):
+        """ Returns None if columnar storage is not used. """
+        return self._variable_columns
 
     def clear(self):
         """ """
 #        self._lookuplist = None
         super(DatasetNode, self).clear()
+        self._indexes = {}
+
+    def get_index(self, index_name):
+        """ Returns the secondary index as a dictionary, value: [nodes]. 
+            Index names: 'scientific_name', 'parameter_unit', 'station_name' and 'sample_date'. 
+            The index is created on demand and must not be modified by the caller. 
+            Indexes are removed when nodes are added or removed. Changes in node data are not 
+            detected, call invalidate_indexes() after changing indexed values. """
+        index = self._indexes.get(index_name, None)
+        if index is None:
+            if index_name not in self._index_definitions:
+                raise UserWarning('Index is not defined: ' + str(index_name))
+            nodelevel, keys = self._index_definitions[index_name]
+            if nodelevel == 'visit':
+                nodes = self._children
+            else:
+                nodes = [variablenode 
+                         for visitnode in self._children 
+                         for samplenode in visitnode._children 
+                         for variablenode in samplenode._children]
+            index = self._create_index(keys, nodes)
+            self._indexes[index_name] = index
+        return index
+
+    def invalidate_indexes(self):
+        """ """
+        if self._indexes:
+            self._indexes = {}
+
+    def _create_index(self, keys, nodes):
+        """ """
+        index = {}
+        if len(keys) == 1:
+            key = keys[0]
+            for node in nodes:
+                index.setdefault(node.get_data(key), []).append(node)
+        elif len(keys) == 2:
+            key1, key2 = keys
+            for node in nodes:
+                index.setdefault((node.get_data(key1), node.get_data(key2)), []).append(node)
+        else:
+            for node in nodes:
+                index.setdefault(tuple([node.get_data(key) for key in keys]), []).append(node)
+        return index
 
     def get_counters(self):
         """ """
@@ -270,11 +452,56 @@ class DatasetNode(DatasetBase, DataNode):
         #
         self._visit_count += 1
         super(DatasetNode, self).add_child(child)
+        self.invalidate_indexes()
 
     def remove_all_children(self):
         """ """
         self._visit_count -= len(self._children)
         self._children = []
+        self.invalidate_indexes()
+        
+    def add_variables(self, sample_nodes, variable_columns):
+        """ Adds one new variable for each item in sample_nodes, to the corresponding sample. 
+            Faster than add_child() for large imports. 
+            variable_columns: List of (key, values) with one value for each variable. """
+        variablecount = len(sample_nodes)
+        columns = self._variable_columns
+        if columns is not None:
+            firstrow = columns._row_count
+            for key, values in variable_columns:
+                if key:
+                    column = columns._columns.get(key, None)
+                    if column is None:
+                        column = []
+                        columns._columns[key] = column
+                    missing = firstrow - len(column)
+                    if missing > 0:
+                        column.extend([_MISSING] * missing)
+                    column.extend(values)
+            columns._row_count += variablecount
+        else:
+            variable_columns = [(key, values) for key, values in variable_columns if key]
+            datadicts = [{} for _ in range(variablecount)]
+            for key, values in variable_columns:
+                for datadict, value in zip(datadicts, values):
+                    datadict[key] = value
+        # Variables are connected directly, as in load_snapshot().
+        for index, samplenode in enumerate(sample_nodes):
+            variablenode = VariableNode.__new__(VariableNode)
+            variablenode._children = ()
+            variablenode._idstring = None
+            if columns is not None:
+                variablenode._datadict = None
+                variablenode._columns = columns
+                variablenode._row = firstrow + index
+            else:
+                variablenode._datadict = datadicts[index]
+                variablenode._columns = None
+                variablenode._row = None
+            variablenode._parent = samplenode
+            samplenode._children.append(variablenode)
+        self._variable_count += variablecount
+        self.invalidate_indexes()
         
     def get_visit_lookup(self, idString):
         """ """
@@ -385,9 +612,165 @@ class DatasetNode(DatasetBase, DataNode):
                     # To target.
                     target_dataset.append_row(row)
 
+    def create_table_view(self):
+        """ Returns a DatasetTable compatible view of the tree. No data is copied. """
+        return DatasetTableView(self)
+
+    def save_snapshot(self, file_name):
+        """ Saves the dataset to a binary snapshot file, pickle based. Variable data is 
+            stored as one list for each key. Load it with load_snapshot(). 
+            Note: Only load snapshots created by the toolbox, pickle files may contain code. """
+        if not file_name:
+            raise UserWarning('File name is missing.')
+        snapshot = self.get_snapshot()
+        with open(file_name, 'wb') as snapshotfile:
+            pickle.dump(snapshot, snapshotfile, protocol = min(5, pickle.HIGHEST_PROTOCOL))
+
+    def load_snapshot(self, file_name):
+        """ Loads a snapshot created by save_snapshot(). The dataset must be empty. """
+        if not file_name:
+            raise UserWarning('File name is missing.')
+        if self._children:
+            raise UserWarning('Snapshots can only be loaded into empty datasets.')
+        try:
+            with open(file_name, 'rb') as snapshotfile:
+                snapshot = pickle.load(snapshotfile)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError):
+            raise UserWarning('Not a valid dataset snapshot: ' + file_name)
+        self.set_snapshot(snapshot, file_name)
+
+    def get_snapshot(self):
+        """ Returns the snapshot content as a dictionary with lists and plain values. 
+            Used by save_snapshot() and when datasets are transferred between processes. """
+        visits = []
+        samples = []
+        variablenodes = []
+        variablesamples = []
+        for visitnode in self._children:
+            visitindex = len(visits)
+            visits.append((visitnode._idstring, visitnode._datadict))
+            for samplenode in visitnode._children:
+                sampleindex = len(samples)
+                samples.append((visitindex, samplenode._idstring, samplenode._datadict))
+                for variablenode in samplenode._children:
+                    variablenodes.append(variablenode)
+                    variablesamples.append(sampleindex)
+        #
+        snapshot = {'format': self._snapshot_format, 
+                    'version': self._snapshot_version, 
+                    'metadata': self._metadata, 
+                    'data': self._datadict, 
+                    'parser_rows': self._datasetparserrows, 
+                    'export_table_columns': self._exporttablecolumns, 
+                    'columnar': self._variable_columns is not None, 
+                    'visits': visits, 
+                    'samples': samples, 
+                    'variable_samples': variablesamples, 
+                    'variable_idstrings': {row: variablenode._idstring 
+                                           for row, variablenode in enumerate(variablenodes) 
+                                           if variablenode._idstring is not None}, 
+                    'variable_columns': self._get_snapshot_columns(variablenodes), 
+                    }
+        return snapshot
+
+    def set_snapshot(self, snapshot, source_name = 'snapshot'):
+        """ Creates the tree from content returned by get_snapshot(). The dataset must be empty. 
+            source_name: Used in error messages. """
+        if self._children:
+            raise UserWarning('Snapshots can only be loaded into empty datasets.')
+        if (not isinstance(snapshot, dict)) or (snapshot.get('format', None) != self._snapshot_format):
+            raise UserWarning('Not a valid dataset snapshot: ' + source_name)
+        if snapshot.get('version', None) != self._snapshot_version:
+            raise UserWarning('Dataset snapshot version ' + str(snapshot.get('version', None)) + 
+                              ' is not supported, version ' + str(self._snapshot_version) + ' is expected.')
+        #
+        self._metadata = snapshot['metadata']
+        self._datadict = snapshot['data']
+        self._datasetparserrows = snapshot['parser_rows']
+        self._exporttablecolumns = snapshot['export_table_columns']
+        if snapshot['columnar']:
+            self.use_columnar_storage()
+        #
+        visitnodes = []
+        for idstring, datadict in snapshot['visits']:
+            visitnode = VisitNode()
+            visitnode._datadict = datadict
+            self.add_child(visitnode)
+            if idstring is not None:
+                visitnode.set_id_string(idstring)
+            visitnodes.append(visitnode)
+        samplenodes = []
+        for visitindex, idstring, datadict in snapshot['samples']:
+            samplenode = SampleNode()
+            samplenode._datadict = datadict
+            visitnodes[visitindex].add_child(samplenode)
+            if idstring is not None:
+                samplenode.set_id_string(idstring)
+            samplenodes.append(samplenode)
+        # Variables are connected directly. Faster than add_child() for large datasets.
+        variablesamples = snapshot['variable_samples']
+        variablecolumns = self._variable_columns
+        if variablecolumns is not None:
+            for key, values, missingrows in snapshot['variable_columns']:
+                for row in missingrows:
+                    values[row] = _MISSING
+                variablecolumns._columns[key] = values
+            variablecolumns._row_count = len(variablesamples)
+        else:
+            datadicts = [{} for _ in variablesamples]
+            for key, values, missingrows in snapshot['variable_columns']:
+                missingrows = set(missingrows)
+                for row, value in enumerate(values):
+                    if row not in missingrows:
+                        datadicts[row][key] = value
+        variablenodes = []
+        for row, sampleindex in enumerate(variablesamples):
+            variablenode = VariableNode()
+            if variablecolumns is not None:
+                variablenode._datadict = None
+                variablenode._columns = variablecolumns
+                variablenode._row = row
+            else:
+                variablenode._datadict = datadicts[row]
+            samplenode = samplenodes[sampleindex]
+            variablenode._parent = samplenode
+            samplenode._children.append(variablenode)
+            variablenodes.append(variablenode)
+        self._variable_count = len(variablenodes)
+        for row, idstring in snapshot['variable_idstrings'].items():
+            variablenodes[row].set_id_string(idstring)
+        self.invalidate_indexes()
+
+    def _get_snapshot_columns(self, variablenodes):
+        """ Returns a list of (key, values, missing rows), one value for each variable. """
+        columns = {}
+        if self._variable_columns is not None:
+            rows = [variablenode._row for variablenode in variablenodes]
+            for key, column in self._variable_columns._columns.items():
+                columnlength = len(column)
+                columns[key] = [column[row] if row < columnlength else _MISSING for row in rows]
+        else:
+            for row, variablenode in enumerate(variablenodes):
+                for key, value in variablenode._datadict.items():
+                    column = columns.get(key, None)
+                    if column is None:
+                        column = [_MISSING] * len(variablenodes)
+                        columns[key] = column
+                    column[row] = value
+        # The missing marker can't be pickled.
+        snapshotcolumns = []
+        for key, values in columns.items():
+            missingrows = [row for row, value in enumerate(values) if value is _MISSING]
+            for row in missingrows:
+                values[row] = None
+            snapshotcolumns.append((key, values, missingrows))
+        return snapshotcolumns
+
 
 class VisitNode(DataNode):
     """ """
+    __slots__ = ()
+    
     def __init__(self):
         """ """
         super(VisitNode, self).__init__()
@@ -401,13 +784,17 @@ class VisitNode(DataNode):
         if not isinstance(child, SampleNode):
             raise UserWarning('AddChild failed. Visit children must be of sample type')
         #
-        self.get_parent()._sample_count += 1
+        datasetnode = self.get_parent()
+        datasetnode._sample_count += 1
         super(VisitNode, self).add_child(child)
+        datasetnode.invalidate_indexes()
 
     def remove_all_children(self):
         """ """
-        self.get_parent()._sample_count -= len(self._children)
+        datasetnode = self.get_parent()
+        datasetnode._sample_count -= len(self._children)
         self._children = []
+        datasetnode.invalidate_indexes()
         
     def set_id_string(self, idstring):
         """ """
@@ -421,6 +808,8 @@ class VisitNode(DataNode):
         
 class SampleNode(DataNode):
     """ """
+    __slots__ = ()
+    
     def __init__(self):
         """ """
         super(SampleNode, self).__init__()
@@ -434,13 +823,20 @@ class SampleNode(DataNode):
         if not isinstance(child, VariableNode):
             raise UserWarning('AddChild failed. Sample children must be of variable type')
         #
-        self.get_parent().get_parent()._variable_count += 1
+        datasetnode = self.get_parent().get_parent()
+        datasetnode._variable_count += 1
         super(SampleNode, self).add_child(child)
+        # Move variable data to columns if used in the dataset.
+        if datasetnode._variable_columns is not None:
+            child._attach_to_columns(datasetnode._variable_columns)
+        datasetnode.invalidate_indexes()
 
     def remove_all_children(self):
         """ """
-        self.get_parent().get_parent()._variable_count -= len(self._children)
+        datasetnode = self.get_parent().get_parent()
+        datasetnode._variable_count -= len(self._children)
         self._children = []
+        datasetnode.invalidate_indexes()
         
     def set_id_string(self, idstring):
         """ """
@@ -453,23 +849,78 @@ class SampleNode(DataNode):
         
 
 class VariableNode(DataNode):
-    """ """
+    """ 
+    When the dataset uses columnar storage the variable node is a row view, and 
+    data is stored in VariableColumns owned by the dataset node.
+    """
+    __slots__ = ('_columns', '_row')
+    
     def __init__(self):
         """ """
         super(VariableNode, self).__init__()
+        self._children = () # Variables can't contain children. Shared empty tuple.
+        self._columns = None # Used for columnar storage.
+        self._row = None # Row in columnar storage.
 
     def clear(self):
         """ """
         super(VariableNode, self).clear()
+        self._children = ()
+        self._columns = None
+        self._row = None
         
     def clone(self):
         """ """
         newvariable = VariableNode()
+        newvariable._datadict = copy.deepcopy(self.get_data_dict())
         self.get_parent().add_child(newvariable) # Connect to the same parent.
-        newvariable._children = [] # Not used for variables.
-        newvariable._datadict = copy.deepcopy(self._datadict)
+        newvariable._children = () # Not used for variables.
         newvariable._idstring = None # Not used for variables.
         return newvariable
+
+    def _attach_to_columns(self, variable_columns):
+        """ Moves node data to columnar storage. Called when added to a dataset using it. """
+        if self._columns is variable_columns:
+            return
+        data_dict = self.get_data_dict()
+        self._columns = variable_columns
+        self._row = variable_columns.add_row()
+        self._datadict = None
+        variable_columns.set_row_dict(self._row, data_dict)
+
+    def add_data(self, key, value):
+        """ """
+        if key:
+            if self._columns is None:
+                self._datadict[key] = value
+            else:
+                self._columns.set_value(self._row, key, value)
+        
+    def get_data(self, key, default_value = ''):
+        """ """
+        if self._columns is None:
+            return self._datadict.get(key, default_value)
+        return self._columns.get_value(self._row, key, default_value)
+
+    def has_data(self, key):
+        """ """
+        if self._columns is None:
+            return key in self._datadict
+        return self._columns.has_value(self._row, key)
+
+    def get_data_dict(self):
+        """ Note: For columnar storage a new dictionary is returned. Changes in it are not stored. 
+            Use get_data() or has_data() for single keys. """
+        if self._columns is None:
+            return self._datadict
+        return self._columns.get_row_dict(self._row)
+        
+    def set_data_dict(self, data_dict):
+        """ """
+        if self._columns is None:
+            self._datadict = data_dict
+        else:
+            self._columns.set_row_dict(self._row, data_dict)
         
     def add_child(self, child):
         """ """
@@ -488,3 +939,171 @@ class VariableNode(DataNode):
         except:
             raise UserWarning('SetIdString failed. Check if parent is assigned.')
 
+
+class DatasetTableView(DatasetBase):
+    """ 
+    Read only table view of a tree dataset, compatible with DatasetTable when 
+    displayed via QAbstractTableModel or saved to file. 
+    Only a flat list of the variable nodes is created. Items are fetched from 
+    the nodes when requested, based on the export table columns of the dataset. 
+    Call refresh() if nodes are added or removed in the dataset.
+    """
+    def __init__(self, dataset):
+        """ """
+        super(DatasetTableView, self).__init__()
+        if not dataset:
+            raise UserWarning('Dataset is missing.')
+        if not dataset.get_export_table_columns():
+            raise UserWarning('Info for converting from tree to table dataset is missing.')
+        #
+        self._dataset = dataset
+        self._header = []
+        self._columns = [] # List of (node level, key).
+        self._variables = []
+        self.refresh()
+
+    def clear(self):
+        """ Clears the view only, the dataset is not changed. """
+        self._header = []
+        self._columns = []
+        self._variables = []
+
+    def refresh(self):
+        """ Rebuilds header and the list of variable nodes. """
+        self._header = []
+        self._columns = []
+        for column_info in self._dataset.get_export_table_columns():
+            self._header.append(column_info.get('header', '---'))
+            self._columns.append((column_info.get('node', ''), 
+                                  column_info.get('key', '---')))
+        #
+        self._variables = [variablenode 
+                           for visitnode in self._dataset.get_children() 
+                           for samplenode in visitnode.get_children() 
+                           for variablenode in samplenode.get_children()]
+
+    def get_header(self):
+        """ """
+        return self._header
+
+    def get_rows(self):
+        """ Rows are created when iterated over. Used when saving or copying to clipboard. """
+        return (self._get_row(row) for row in range(len(self._variables)))
+
+    def get_header_item(self, column):
+        """ Used for calls from QAbstractTableModel. """
+        try:
+            return self._header[column]
+        except Exception:
+            return ''
+
+    def get_data_item(self, row, column):
+        """ Used for calls from QAbstractTableModel. """
+        try:
+            nodelevel, key = self._columns[column]
+            variablenode = self._variables[row]
+        except Exception:
+            return ''
+        if nodelevel == 'variable':
+            return variablenode.get_data(key)
+        elif nodelevel == 'sample':
+            return variablenode.get_parent().get_data(key)
+        elif nodelevel == 'visit':
+            return variablenode.get_parent().get_parent().get_data(key)
+        elif nodelevel == 'dataset':
+            return self._dataset.get_data(key)
+        return ''
+
+    def get_data_item_by_column_name(self, row, column_name):
+        """  """
+        try:
+            column = self._header.index(column_name)
+        except ValueError:
+            return ''
+        return self.get_data_item(row, column)
+
+    def get_column_count(self):
+        """ Used for calls from QAbstractTableModel. """
+        return len(self._header)
+
+    def get_row_count(self):
+        """ Used for calls from QAbstractTableModel. """
+        return len(self._variables)
+
+    def save_as_file(self, text_file_name = None, excel_file_name = None):
+        """ Save to text or Excel, depending on which parameter is used. """
+        tablefilewriter = toolbox_utils.TableFileWriter(
+                                file_path = '', # Is included in the file names below.
+                                text_file_name = text_file_name,                 
+                                excel_file_name = excel_file_name,                 
+                                )
+        #
+        tablefilewriter.write_file(self._header, 
+                                   self.get_rows())
+
+    def _get_row(self, row):
+        """ """
+        variablenode = self._variables[row]
+        samplenode = variablenode.get_parent()
+        visitnode = samplenode.get_parent()
+        rowitems = []
+        for nodelevel, key in self._columns:
+            if nodelevel == 'variable':
+                rowitems.append(variablenode.get_data(key))
+            elif nodelevel == 'sample':
+                rowitems.append(samplenode.get_data(key))
+            elif nodelevel == 'visit':
+                rowitems.append(visitnode.get_data(key))
+            elif nodelevel == 'dataset':
+                rowitems.append(self._dataset.get_data(key))
+            else:
+                rowitems.append('')
+        return rowitems
+
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. Memory used for each variable, measured with tracemalloc.
+        Run from the toolbox directory: python -m plankton_core.dataset_manager
+    """
+    import tracemalloc
+    
+    variablecount = 20000
+    keys = ['scientific_name', 'species_flag_code', 'size_class', 'trophic_type', 
+            'parameter', 'value', 'unit', 'plankton_group', 'taxon_kingdom', 
+            'taxon_phylum', 'taxon_class', 'taxon_order', 'taxon_family', 
+            'taxon_genus', 'taxon_hierarchy', 'sampling_laboratory', 
+            'analytical_laboratory', 'analysis_date', 'analysed_by']
+    
+    def create_dataset(columnar, interned):
+        """ Values are new string objects for each row, as when read from files. """
+        dataset = DatasetNode()
+        if columnar:
+            dataset.use_columnar_storage()
+        visit = VisitNode()
+        dataset.add_child(visit)
+        sample = SampleNode()
+        visit.add_child(sample)
+        for index in range(variablecount):
+            variable = VariableNode()
+            sample.add_child(variable)
+            for key in keys:
+                value = ''.join(['Value ', key, str(index % 7)])
+                if interned:
+                    value = dataset.intern_value(value)
+                variable.add_data(key, value)
+        return dataset
+    
+    print('Variables: ' + str(variablecount) + ', keys: ' + str(len(keys)))
+    for columnar in [False, True]:
+        for interned in [False, True]:
+            tracemalloc.start()
+            dataset = create_dataset(columnar, interned)
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del dataset
+            print('- %-9s %-12s %6d bytes/variable' % ('Columnar' if columnar else 'Dict', 
+                                                      'interned' if interned else 'not interned',
+                                                      size // variablecount))
@@ -356,6 +356,11 @@ class PlanktonCounterSample():
                     if sample_row.get_abundance_class():
                         self._sample_rows[sample_row.get_key()] = sample_row
 
+    def update_species_info(self):
+        """ Used when the species lists are reloaded. Counted values are kept. """
+        for sample_row in self._sample_rows.values():
+            sample_row.update_species_info()
+
     def recalculate_coefficient(self, current_method):
         """ """
         # Recalculate all rows.
@@ -705,6 +710,11 @@ class SampleRow():
         self._scientific_name = self._sample_row_dict.get('scientific_name', '')
         self._size_class = self._sample_row_dict.get('size_class', '')
         #
+        self.update_species_info()
+
+    def update_species_info(self):
+        """ Updates values from the species lists. Called again when the 
+            species lists are reloaded. """
         # Get species related dictionaries for this taxon/sizeclass.
         self._taxon_dict = plankton_core.Species().get_taxon_dict(self._scientific_name)
         self._size_class_dict = plankton_core.Species().get_bvol_dict(self._scientific_name, self._size_class)
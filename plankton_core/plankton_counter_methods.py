@@ -24,6 +24,9 @@ class PlanktonCounterMethods():
         self._check_dir_path(self._methods_dir_path) 
         self._check_dir_path(self._methods_species_lists_dir_path) 
         self._check_dir_path(self._methods_dir_path) 
+        # Species tables are reused until the source is changed. 
+        # Key: counting species list name. Value: (source, header, rows).
+        self._counting_species_tables = {}
 
     def _check_dir_path(self, dir_path):
         """ Check if exists. Create if not. """
@@ -73,24 +76,37 @@ class PlanktonCounterMethods():
             raise UserWarning('The directory ' + speciesdirpath + ' does not exists.')
 
     def get_counting_species_table(self, counting_species_file_name):
-        """ """
+        """ Returns header and rows. The result is cached, rows should not be modified. """
         # Use all prealoaded species.
         if counting_species_file_name == '<valid taxa>':
 #         if counting_species_file_name == '<all species>':
+            taxa_dict = plankton_core.Species().get_taxa_dict()
+            # A new dictionary is used when the species lists are reloaded.
+            cached = self._counting_species_tables.get(counting_species_file_name, None)
+            if cached and (cached[0] is taxa_dict):
+                return cached[1], cached[2]
             species_list_of_list = []
 #             for key in sorted(plankton_core.Species().get_taxa_lookup_dict().keys()):
-            for key in sorted(plankton_core.Species().get_taxa_dict().keys()):
+            for key in sorted(taxa_dict.keys()):
                 species_list_of_list.append([key])
+            self._counting_species_tables[counting_species_file_name] = (taxa_dict, ['scientific_name'], species_list_of_list)
             return ['scientific_name'], species_list_of_list
                 
         # Read stored species file.
         filepath = os.path.join(self._methods_species_lists_dir_path, counting_species_file_name + '.txt')
         if os.path.isfile(filepath):
+            stat = os.stat(filepath)
+            source = stat.st_mtime, stat.st_size
+            cached = self._counting_species_tables.get(counting_species_file_name, None)
+            if cached and (cached[0] == source):
+                return cached[1], cached[2]
             tablefilereader = toolbox_utils.TableFileReader(
                         file_path = self._methods_species_lists_dir_path,
                         text_file_name = counting_species_file_name + '.txt',                 
                         )
-            return tablefilereader.header(), tablefilereader.rows()
+            header, rows = tablefilereader.header(), tablefilereader.rows()
+            self._counting_species_tables[counting_species_file_name] = (source, header, rows)
+            return header, rows
         else:
             return [], []
 
@@ -116,12 +132,14 @@ class PlanktonCounterMethods():
         #
         header = ['scientific_name']
         tablefilewriter_method.write_file(header, species_list)
+        self._counting_species_tables.pop(specieslistname, None)
     
     def delete_counting_species_list(self, counting_species_list):
         """ """
         filepath = os.path.join(self._methods_species_lists_dir_path, counting_species_list + '.txt')
         if os.path.isfile(filepath):
             os.remove(filepath)
+        self._counting_species_tables.pop(counting_species_list, None)
         
     def delete_counting_method(self, counting_method_name):
         """ """
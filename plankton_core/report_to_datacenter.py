@@ -8,6 +8,9 @@ import plankton_core
 
 class CreateReportToDataCenter(object):
     """ """
+    # Species related values used in add_new_fields().
+    _species_fields = ['taxon_class', 'rank', 'bvol_unit', 'bvol_size_range', 'harmful']
+    
     def __init__(self):
         """ """
         super().__init__()
@@ -166,6 +169,12 @@ class CreateReportToDataCenter(object):
                             # Complement columns.
 #                             self._add_more_content(row_dict)
         #
+        # Species related values, resolved once for each taxon/size class.
+        species_info = plankton_core.Species().enrich_batch(
+                [(row_dict.get('scientific_name', ''), row_dict.get('size_class', '')) 
+                 for row_dict in report_rows_dict.values()], 
+                self._species_fields)
+        #
         sorted_key_list = sorted(report_rows_dict.keys())
         for key in sorted_key_list:
             # Copy items.
@@ -174,23 +183,28 @@ class CreateReportToDataCenter(object):
             #
             self.cleanup_fields(row_dict)
             #
-            self.add_new_fields(row_dict)
+            self.add_new_fields(row_dict, species_info)
             #
             for item in self._header_counted_items:
                 report_row.append(row_dict.get(item, ''))
             # Add all rows to result.
             result_table.append_row(report_row)
     
-    def add_new_fields(self, row_dict):
-        """ """
+    def add_new_fields(self, row_dict, species_info = None):
+        """ species_info: Result from Species().enrich_batch() for all rows. 
+            Values are fetched for this row only if not available. """
         scientificname = row_dict.get('scientific_name', '')
         sizeclass = row_dict.get('size_class', '')
         if scientificname:
-            taxon_class = plankton_core.Species().get_taxon_value(scientificname, u'taxon_class')
-            taxon_rank = plankton_core.Species().get_taxon_value(scientificname, u'rank')
-            counted_unit = plankton_core.Species().get_bvol_value(scientificname, sizeclass, u'bvol_unit')
-            bvol_size_range = plankton_core.Species().get_bvol_value(scientificname, sizeclass, u'bvol_size_range')
-            harmful = plankton_core.Species().get_taxon_value(scientificname, u'harmful')
+            item = (scientificname, sizeclass)
+            if (species_info is None) or (item not in species_info):
+                species_info = plankton_core.Species().enrich_batch([item], self._species_fields)
+            values = species_info[item]
+            taxon_class = values['taxon_class']
+            taxon_rank = values['rank']
+            counted_unit = values['bvol_unit']
+            bvol_size_range = values['bvol_size_range']
+            harmful = values['harmful']
             if len(str(harmful).strip()) > 0:
                 harmful = 'Y'
             else:
@@ -4,7 +4,7 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
-import toolbox_utils
+import toolbox_utils
 import plankton_core
 
 @toolbox_utils.singleton
@@ -109,6 +109,8 @@ class ScreeningManager(object):
     def species_screening(self, datasets):
         """ """
         species = plankton_core.Species()
+        taxalookup = species.get_taxa_lookup_dict()
+        unknowntaxa = {} # Key: taxon name. Value: Logged item, with similar names.
         #
         for dataset in datasets:
             #
@@ -118,29 +120,41 @@ class ScreeningManager(object):
                     #
                     for variablenode in samplenode.get_children():
                         #
-                        data_dict = variablenode.get_data_dict()
-                        if 'scientific_name' in data_dict:
-                            if data_dict['scientific_name'] not in species.get_taxa_lookup_dict():
-                                toolbox_utils.Logging().warning('Taxon name not in species list.  Taxon name: ' + str(data_dict['scientific_name']))
+                        if variablenode.has_data('scientific_name'):
+                            taxonname = variablenode.get_data('scientific_name')
+                            if taxonname not in taxalookup:
+                                item = unknowntaxa.get(taxonname, None)
+                                if item is None:
+                                    item = str(taxonname)
+                                    similarnames = species.get_similar_taxon_names(taxonname, max_count = 3)
+                                    if similarnames:
+                                        item += '  Similar names: ' + ', '.join(name for name, _similarity in similarnames)
+                                    unknowntaxa[taxonname] = item
+                                # Accumulated to one row for all taxa.
+                                toolbox_utils.Logging().warning('Taxon name not in species list.  Taxon name', item = item)
      
     def bvol_species_screening(self, datasets):
         """ """
         species = plankton_core.Species()
         #
         for dataset in datasets:
-            #
+            # Collect taxon/size class pairs. Checked in one batch lookup below.
+            taxonsizeclasslist = []
             for visitnode in dataset.get_children():
                 #
                 for samplenode in visitnode.get_children():
                     #
                     for variablenode in samplenode.get_children():
                         #
-                        data_dict = variablenode.get_data_dict()
-                        if ('scientific_name' in data_dict) and ('size_class' in data_dict):
-                            taxonname = data_dict['scientific_name']
-                            sizeclass = data_dict['size_class'] 
-                            
-                            if species.get_bvol_value(taxonname, sizeclass, 'bvol_size_class') == None:
-                                toolbox_utils.Logging().warning('Taxon name/size clas not in BVOL list.  Taxon name: ' + str(taxonname) + '  Size class: ' + str(sizeclass))
+                        taxonname = variablenode.get_data('scientific_name', None)
+                        sizeclass = variablenode.get_data('size_class', None)
+                        if (taxonname is not None) and (sizeclass is not None):
+                            taxonsizeclasslist.append((taxonname, sizeclass))
+            #
+            bvoldicts = species.get_bvol_dicts(taxonsizeclasslist)
+            for (taxonname, sizeclass), bvoldict in zip(taxonsizeclasslist, bvoldicts):
+                if not bvoldict:
+                    toolbox_utils.Logging().warning('Taxon name/size class not in BVOL list.  Taxon name [size class]', 
+                                                    item = str(taxonname) + ' [' + str(sizeclass) + ']')
      
 
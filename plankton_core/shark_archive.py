@@ -121,7 +121,15 @@ class SharkArchive():
             self._metadataauto_dict = toolbox_utils.TableFileReader() # Empty object.
 
     def generate_metadata_auto(self):
-        """ """
+        """ Rows are streamed from the archive if data is not loaded. """
+        data_tableobject = self._data_tableobject
+        if data_tableobject is None:
+            data_tableobject = toolbox_utils.TableFileReader(
+                                                file_path = self._file_path,
+                                                zip_file_name = self._archive_filename,
+                                                zip_file_entry = 'shark_data.txt',
+                                                stream_rows = True,
+                                                )
         # Index for columns.
         year_index = None
         date_index = None
@@ -140,17 +148,19 @@ class SharkArchive():
         max_latitude = None
         parameter_unit_list = []
         # Check header. Supports different sets of column names.
-        for item_index, item in enumerate(self._data_tableobject.header()):
+        for item_index, item in enumerate(data_tableobject.header()):
             if item in ['year', 'visit_year']: year_index = item_index
             if item in ['sample_date', 'sampling_date', 'visit_date']: date_index = item_index
             if item in ['sample_latitude_dd', 'latitude_dd', 'lat_dd']: latitude_index = item_index
             if item in ['sample_longitude_dd', 'sample_longitude_dd', 'long_dd']: longitude_index = item_index
             if item in ['parameter']: parameter_index = item_index
             if item in ['unit']: unit_index = item_index
-            #
-            max_index = max(year_index, date_index, latitude_index, longitude_index, parameter_index, unit_index)
+        #
+        max_index = max([index for index in [year_index, date_index, latitude_index, 
+                                             longitude_index, parameter_index, unit_index] 
+                         if index is not None], default = -1)
         # Scan rows.
-        for row in self._data_tableobject.rows():
+        for row in data_tableobject.iterate_rows():
             if len(row) > max_index:
                 if year_index:
                     min_year = min(row[year_index], min_year) if min_year else row[year_index]
@@ -219,9 +229,17 @@ class SharkArchive():
             zip_write = zipfile.ZipFile(zip_namepath, 'a', zipfile.ZIP_DEFLATED) # Append to zip.
             try:
                 if self._data_tableobject is not None:
-                    data = '\t'.join(self._data_tableobject.header()) + '\r\n' + \
-                           '\r\n'.join(map('\t'.join, self._data_tableobject.rows()))
-                    zip_write.writestr('shark_data.txt', data.encode('cp1252', errors='ignore'))
+                    # Written in chunks to avoid a copy of all data as one string.
+                    # Same content as before: header, '\r\n' and rows separated by '\r\n'. 
+                    # The size is not known in advance, zip64 is needed for large files.
+                    with zip_write.open('shark_data.txt', 'w', force_zip64 = True) as data_entry:
+                        data = '\t'.join(self._data_tableobject.header()) + '\r\n'
+                        data_entry.write(data.encode('cp1252', errors='ignore'))
+                        separator = ''
+                        for rows in self._data_tableobject.read_chunks():
+                            data = separator + '\r\n'.join(map('\t'.join, rows))
+                            data_entry.write(data.encode('cp1252', errors='ignore'))
+                            separator = '\r\n'
                 #
                 if self._metadata_text is not None:
                     zip_write.writestr('shark_metadata.txt', self._metadata_text.encode('cp1252', errors='replace'))
@@ -5,7 +5,14 @@
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
 import sys
+import os
+import time
 import math
+import pickle
+import hashlib
+import threading
+import concurrent.futures
+from PyQt5 import QtCore
 import toolbox_utils
 import app_framework
 import pathlib
@@ -29,11 +36,37 @@ class Species(object):
     - Taxa files columns: scientific_name, rank, parent_name.
     - etc. (Documented on the wiki pages mentioned above.)
     
+    Loaded data is cached in 'species_cache.pickle'. The cache is rebuilt when 
+    files are added, removed or changed (name, size or modification time).
     """
+    # Increase when the content of the loaded data structures is changed.
+    _species_cache_version = 1
+    # Read the species files in a process pool. Merged in the same order as when read one by one.
+    _parallel_loading = True
+    # Only one reload at a time.
+    _reload_lock = threading.Lock()
+    # Lookup methods counted when statistics are used. See start_lookup_statistics().
+    # Hits and misses are only counted for methods with one taxon as result.
+    _statistics_methods = ['get_taxon_dict', 'get_taxon_value', 'get_bvol_dict', 'get_bvol_value', 
+                           'get_plankton_group_from_taxon_name', 'get_ancestor_at_rank']
+    _statistics_batch_methods = ['get_bvol_dicts', 'get_bvol_values', 'enrich_batch', 
+                                 'get_similar_taxon_names']
+    _lookup_statistics = None # Key: method name. Value: [calls, hits, misses, seconds].
+    _lookup_misses = None # Key: method name. Value: {scientific name: counter}.
+    # Ranks used for the classification keys in taxon objects.
+    _classification_keys = [('Species', 'taxon_species'), 
+                            ('Genus', 'taxon_genus'), 
+                            ('Family', 'taxon_family'), 
+                            ('Order', 'taxon_order'), 
+                            ('Class', 'taxon_class'), 
+                            ('Phylum', 'taxon_phylum'), 
+                            ('Kingdom', 'taxon_kingdom')]
+    
     def __init__(self):
         
         plankton_toolbox_data_path = app_framework.ToolboxUserSettings().get_path_to_plankton_toolbox_data()
         self._species_directory_path = str(pathlib.Path(plankton_toolbox_data_path, 'species'))
+        self._species_cache_path = str(pathlib.Path(plankton_toolbox_data_path, 'species_cache.pickle'))
         # Taxa files.
         self._taxa_filenames = self._get_files_by_prefix('taxa_')
         # Translate files.
@@ -63,6 +96,129 @@ class Species(object):
             toolbox_utils.Logging().error('Exception: (' + debug_info + '): ' + str(e))
             raise
 
+    def reload(self):
+        """ Loads the species files again, for example when a bvol_ or translate_ file 
+            is updated. New and removed files are also handled. The new data is loaded 
+            into a new Species object that replaces the singleton instance when completed. 
+            Species() returns the new object after that. Lookups that already hold the 
+            old object continue with the old data, old and new data is never mixed. 
+            Memoized values (plankton groups, bvol and ancestor lookups, name indexes) 
+            are stored in the same object and are replaced at the same time. 
+            The old object is kept if loading fails. Returns the new object. """
+        with self._reload_lock:
+            newspecies = object.__new__(self.__class__)
+            newspecies.__init__()
+            # Lookup statistics continue in the new object, with the same counters.
+            if self._lookup_statistics is not None:
+                newspecies._add_counting_methods(self._lookup_statistics, self._lookup_misses)
+            Species.replace_instance(newspecies)
+            return newspecies
+    
+    def start_lookup_statistics(self):
+        """ Used for performance analysis. Counts calls, hits, misses and time spent 
+            for the lookup methods, and misses for each distinct name. Adds some 
+            overhead to each call. 
+            The statistics are logged, and cleared, at the end of each operation that 
+            uses accumulated logging, or when log_lookup_statistics() is called. """
+        self.stop_lookup_statistics()
+        self._add_counting_methods({}, {})
+        toolbox_utils.Logging().add_summary_callback(_log_lookup_statistics)
+    
+    def stop_lookup_statistics(self):
+        """ """
+        for methodname in self._statistics_methods + self._statistics_batch_methods:
+            self.__dict__.pop(methodname, None)
+        toolbox_utils.Logging().remove_summary_callback(_log_lookup_statistics)
+        self._lookup_statistics = None
+        self._lookup_misses = None
+    
+    def _add_counting_methods(self, lookup_statistics, lookup_misses):
+        """ Used by start_lookup_statistics() and reload(). """
+        self._lookup_statistics = lookup_statistics
+        self._lookup_misses = lookup_misses
+        for methodname in self._statistics_methods + self._statistics_batch_methods:
+            # Instance attributes are used before methods in the class.
+            setattr(self, methodname, self._create_counting_method(methodname))
+    
+    def get_lookup_statistics(self):
+        """ Returns a dictionary. Key: method name. Value: dictionary with calls, 
+            hits, misses, seconds and misses for each name. Empty if not started. """
+        result = {}
+        if self._lookup_statistics is None:
+            return result
+        for methodname, (calls, hits, misses, seconds) in self._lookup_statistics.items():
+            result[methodname] = {'calls': calls, 'hits': hits, 'misses': misses, 
+                                  'seconds': seconds, 
+                                  'missed_names': dict(self._lookup_misses.get(methodname, {}))}
+        return result
+    
+    def log_lookup_statistics(self, max_names = 50):
+        """ Logs and clears the statistics. Missed names are logged on one row for each method. """
+        if not self._lookup_statistics:
+            return
+        statistics = self.get_lookup_statistics()
+        if not any(values['calls'] for values in statistics.values()):
+            return
+        logging = toolbox_utils.Logging()
+        logging.log('Species lookup statistics (time includes nested lookups):')
+        for methodname in self._statistics_methods + self._statistics_batch_methods:
+            values = statistics.get(methodname, None)
+            if (values is None) or (values['calls'] == 0):
+                continue
+            text = '- ' + methodname + ': ' + str(values['calls']) + ' calls'
+            if methodname in self._statistics_methods:
+                hitrate = 100.0 * values['hits'] / values['calls']
+                text += ', ' + str(values['hits']) + ' hits, ' + str(values['misses']) + ' misses' + \
+                        ' (hit rate ' + str(round(hitrate, 1)) + '%)'
+            text += ', ' + str(round(values['seconds'] * 1000.0, 1)) + ' ms' + \
+                    ' (' + str(round(values['seconds'] * 1000000.0 / values['calls'], 2)) + ' us/call)'
+            logging.log(text)
+        for methodname in self._statistics_methods:
+            missednames = statistics.get(methodname, {}).get('missed_names', {})
+            if missednames:
+                names = sorted(missednames)
+                text = ', '.join((name + ' (' + str(missednames[name]) + ')') if missednames[name] > 1 else name 
+                                 for name in names[:max_names])
+                if len(names) > max_names:
+                    text += ', ...'
+                logging.log('- ' + methodname + ', ' + str(len(names)) + ' missed names: ' + text)
+        # Clear. The counting methods use the same objects.
+        for counters in self._lookup_statistics.values():
+            counters[:] = [0, 0, 0, 0.0]
+        for misses in self._lookup_misses.values():
+            misses.clear()
+    
+    def _create_counting_method(self, methodname):
+        """ Wraps a lookup method with counters. See start_lookup_statistics(). """
+        method = getattr(self.__class__, methodname)
+        counters = self._lookup_statistics.setdefault(methodname, [0, 0, 0, 0.0])
+        misses = self._lookup_misses.setdefault(methodname, {})
+        countmisses = methodname in self._statistics_methods
+        usesizeclass = methodname in ['get_bvol_dict', 'get_bvol_value']
+        perf_counter = time.perf_counter
+        def counting_method(*args, **kwargs):
+            starttime = perf_counter()
+            result = method(self, *args, **kwargs)
+            counters[3] += perf_counter() - starttime
+            counters[0] += 1
+            if countmisses:
+                if result and (result != 'OTHERS'):
+                    counters[1] += 1
+                else:
+                    counters[2] += 1
+                    name = str(args[0]) if args else ''
+                    if usesizeclass and (len(args) > 1):
+                        name += ' [' + str(args[1]) + ']'
+                    misses[name] = misses.get(name, 0) + 1
+            return result
+        return counting_method
+    
+    def get_data_version(self):
+        """ Returns a string that is changed when the loaded species files are changed. 
+            Used as part of cache keys for values based on species data. """
+        signature = repr((self._species_cache_version, self._source_files_signature))
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+    
     def get_taxa_dict(self):
         """ """
         return self._taxa 
@@ -86,27 +242,102 @@ class Species(object):
         #
         return ''
     
+    def enrich_batch(self, names, fields):
+        """ Returns species related values for many rows. Each distinct name is 
+            resolved once, and all fields are returned together.
+            names: Iterable with scientific names, or with (scientific_name, size_class) 
+                tuples if size class related fields are used. Duplicates are allowed.
+            fields: List of field names:
+                'plankton_group': As get_plankton_group_from_taxon_name().
+                'trophic_type': From the size class, or from the taxon if not 
+                                available for the size class.
+                'size_class_trophic_type': From the size class only.
+                'bvol_...': Size class values, i.e. 'bvol_unit' or 'bvol_size_range'.
+                'taxon_kingdom' to 'taxon_species': As get_ancestor_at_rank().
+                Other fields are taxon values, i.e. 'taxon_class', 'rank', 
+                'harmful', 'author' or 'size_classes'.
+            Returns a dictionary. Key: name or tuple as in names. Value: dictionary 
+            with field values. Empty string for missing values. """
+        taxalookup = self._taxa_lookup
+        bvollookup = self._bvol_lookup
+        emptydict = {}
+        rankfields = {key: rank for rank, key in self._classification_keys}
+        result = {}
+        for item in names:
+            if item in result:
+                continue
+            if isinstance(item, tuple):
+                scientific_name, size_class = item
+                sizeclassobject = bvollookup.get((scientific_name, str(size_class)), emptydict)
+            else:
+                scientific_name = item
+                sizeclassobject = emptydict
+            taxonobject = taxalookup.get(scientific_name, emptydict)
+            values = {}
+            for field in fields:
+                if field == 'plankton_group':
+                    values[field] = self.get_plankton_group_from_taxon_name(scientific_name)
+                elif field == 'trophic_type':
+                    values[field] = sizeclassobject.get('trophic_type', '') or \
+                                    taxonobject.get('trophic_type', '')
+                elif field == 'size_class_trophic_type':
+                    values[field] = sizeclassobject.get('trophic_type', '')
+                elif field.startswith('bvol_'):
+                    values[field] = sizeclassobject.get(field, '')
+                elif field in rankfields:
+                    values[field] = self.get_ancestor_at_rank(scientific_name, rankfields[field])
+                else:
+                    values[field] = taxonobject.get(field.lower(), '')
+            result[item] = values
+        #
+        return result
+    
+    def get_similar_taxon_names(self, scientific_name, max_count = 5, min_similarity = 0.4):
+        """ Fuzzy matching against all taxon names, including translated names 
+            and synonyms. Returns a list of (scientific_name, similarity) tuples 
+            with the best match first. Similarity is 1.0 for identical names. """
+        return self._get_taxon_name_index().find_similar(scientific_name, 
+                                                         max_count = max_count, 
+                                                         min_similarity = min_similarity)
+    
+    def get_best_taxon_name_match(self, scientific_name, min_similarity = 0.7):
+        """ Returns the taxon name, or the most similar one if not found. 
+            None if no name is similar enough. """
+        if scientific_name in self._taxa_lookup:
+            return scientific_name
+        return self._get_taxon_name_index().find_best_match(scientific_name, 
+                                                            min_similarity = min_similarity)
+    
+    def _get_taxon_name_index(self):
+        """ The n-gram index is created when first used. """
+        if self._taxon_name_index is None:
+            self._taxon_name_index = toolbox_utils.NgramIndex(sorted(self._taxa_lookup.keys()))
+        return self._taxon_name_index
+    
     def get_bvol_dict(self, scientific_name, size_class):
         """ """
-        if scientific_name in self._taxa_lookup:
-            speciesobject = self._taxa_lookup[scientific_name]
-            if 'size_classes' in speciesobject:
-                for sizeclassobject in speciesobject['size_classes']:
-                    if sizeclassobject.get('bvol_size_class', '') == str(size_class):
-                        return sizeclassobject
-        #
-        return {}
+        return self._bvol_lookup.get((scientific_name, str(size_class)), {})
 
     def get_bvol_value(self, scientific_name, size_class, key):
         """ """
-        if scientific_name in self._taxa_lookup:
-            speciesobject = self._taxa_lookup[scientific_name]
-            if 'size_classes' in speciesobject:
-                for sizeclassobject in speciesobject['size_classes']:
-                    if sizeclassobject.get('bvol_size_class', '') == str(size_class):
-                        return sizeclassobject.get(key, '')
-        #
-        return '' 
+        sizeclassobject = self._bvol_lookup.get((scientific_name, str(size_class)), None)
+        if sizeclassobject is None:
+            return '' 
+        return sizeclassobject.get(key, '')
+    
+    def get_bvol_dicts(self, taxon_size_class_list):
+        """ Batch version of get_bvol_dict(). The parameter is a list of 
+            (scientific_name, size_class) tuples. Returns a list of dictionaries, 
+            empty if not found. """
+        bvollookup = self._bvol_lookup
+        emptydict = {}
+        return [bvollookup.get((scientific_name, str(size_class)), emptydict) 
+                for scientific_name, size_class in taxon_size_class_list]
+    
+    def get_bvol_values(self, taxon_size_class_list, key):
+        """ Batch version of get_bvol_value(). Returns a list of values. """
+        return [sizeclassobject.get(key, '') 
+                for sizeclassobject in self.get_bvol_dicts(taxon_size_class_list)]
     
     def _clear(self):
         """ """
@@ -118,14 +349,31 @@ class Species(object):
         self._planktongroups_lookup = {}
         self._bvolcolumns_dict = {}        
         self._harmful = {}
+        self._bvol_lookup = {} # Key: (scientific_name, size_class). Includes synonyms.
+        self._ancestor_lookup = {} # Key: scientific_name. Value: {rank: scientific_name}.
+        self._taxon_name_index = None # Fuzzy name matching. Created when first used.
+        self._table_file_readers = {} # Files already read in parallel. Key: file name.
+        self._source_files_signature = [] # Used by get_data_version().
 
-    def _load_all_data(self):
+    def _load_all_data(self, use_cache = True):
         """ """
         try:
             self._clear()
             toolbox_utils.Logging().log('') # Empty line.
             toolbox_utils.Logging().log('Loading species lists (located in "' + self._species_directory_path + '"):')
             
+            # Use cached data if the species files are unchanged.
+            sourcefiles = self._get_source_files_signature()
+            self._source_files_signature = sourcefiles
+            if use_cache and self._load_cache(sourcefiles):
+                self._create_bvol_lookup()
+                self._create_ancestor_lookup()
+                return
+            
+            # Parse all files first. The content is merged below, one file at a time.
+            if self._parallel_loading:
+                self._read_files_in_parallel()
+            
             # Load taxa.
             for excelfilename in self._taxa_filenames:
                 if os.path.exists(excelfilename):
@@ -185,6 +433,7 @@ class Species(object):
                         self._load_bvol(excelfilename)        
                     finally:
                         toolbox_utils.Logging().log_all_accumulated_rows()    
+            self._create_bvol_lookup()
 
             # Load trophic types.
             for excelfilename in self._trophictype_filenames:
@@ -224,14 +473,109 @@ class Species(object):
             
             # Perform some useful pre-calculations.
             self._precalculate_data()
+            
+            # Cache for the next start.
+            self._save_cache(sourcefiles)
         #
         except Exception as e:
             toolbox_utils.Logging().error('Failed when loading species data: ' + str(e))            
             raise
+        finally:
+            self._table_file_readers = {}
+    
+    def _read_files_in_parallel(self):
+        """ Reads all species files in a process pool. Used by _get_table_file_reader(). """
+        filenames = self._get_source_files()
+        try:
+            tablefilereaders = toolbox_utils.read_excel_files(filenames)
+            self._table_file_readers = dict(zip(filenames, tablefilereaders))
+        except Exception as e:
+            # Read one by one instead. Errors are then reported for the failing file.
+            toolbox_utils.Logging().warning('Failed to read species files in parallel: ' + str(e))
+            self._table_file_readers = {}
+    
+    def _get_table_file_reader(self, excel_file_name):
+        """ Returns the content of a file read in parallel, or reads it now. """
+        tablefilereader = self._table_file_readers.pop(excel_file_name, None)
+        if tablefilereader is None:
+            tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        return tablefilereader
+    
+    def _get_source_files(self):
+        """ Paths to all used species files, in load order. """
+        sourcefiles = []
+        for filenames in [self._taxa_filenames, 
+                          self._taxatranslate_filenames, 
+                          self._taxasynonyms_filenames, 
+                          self._bvolcolumns_filenames, 
+                          self._bvol_filenames, 
+                          self._trophictype_filenames, 
+                          self._harmful_filenames, 
+                          self._planktongroups_filenames]:
+            for filename in filenames:
+                if os.path.exists(filename):
+                    sourcefiles.append(filename)
+        return sourcefiles
+    
+    def _get_source_files_signature(self):
+        """ Name, size and modification time for all used species files, in load order. """
+        sourcefiles = []
+        for filename in self._get_source_files():
+            filestat = os.stat(filename)
+            sourcefiles.append((os.path.basename(filename), filestat.st_size, filestat.st_mtime_ns))
+        return sourcefiles
+    
+    def _load_cache(self, sourcefiles):
+        """ Returns True if loaded data could be restored from the cache file. """
+        if not os.path.exists(self._species_cache_path):
+            return False
+        try:
+            with open(self._species_cache_path, 'rb') as cachefile:
+                cache = pickle.load(cachefile)
+            if (cache.get('version', None) != self._species_cache_version) or \
+               (cache.get('source_files', None) != sourcefiles):
+                toolbox_utils.Logging().log('Species files changed, cache will be rebuilt.')
+                return False
+            data = cache['data']
+            self._taxa = data['taxa']
+            self._taxa_lookup = data['taxa_lookup']
+            self._planktongroups_ranks_set = data['planktongroups_ranks_set']
+            self._planktongroups_rank_dict = data['planktongroups_rank_dict']
+            self._bvolcolumns_dict = data['bvolcolumns_dict']
+            self._harmful = data['harmful']
+        except Exception as e:
+            toolbox_utils.Logging().warning('Failed to read species cache, files will be loaded: ' + str(e))
+            self._clear()
+            return False
+        #
+        for filename, _size, _mtime in sourcefiles:
+            toolbox_utils.Logging().log('- ' + filename)
+        toolbox_utils.Logging().log('Species lists loaded from cache: ' + self._species_cache_path)
+        return True
+    
+    def _save_cache(self, sourcefiles):
+        """ Written to a temporary file first. The cache file is replaced when completed. """
+        cache = {'version': self._species_cache_version, 
+                 'source_files': sourcefiles, 
+                 'data': {'taxa': self._taxa, # Note: taxa_lookup contains the same objects.
+                          'taxa_lookup': self._taxa_lookup, 
+                          'planktongroups_ranks_set': self._planktongroups_ranks_set, 
+                          'planktongroups_rank_dict': self._planktongroups_rank_dict, 
+                          'bvolcolumns_dict': self._bvolcolumns_dict, 
+                          'harmful': self._harmful, 
+                          }, 
+                 }
+        tmpfilepath = self._species_cache_path + '.tmp'
+        try:
+            with open(tmpfilepath, 'wb') as cachefile:
+                pickle.dump(cache, cachefile, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfilepath, self._species_cache_path)
+        except Exception as e:
+            toolbox_utils.Logging().warning('Failed to write species cache: ' + str(e))
             
     def _load_trophic_types(self, excel_file_name):
         """ Adds trophic type info to the species objects. """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         for row in tablefilereader.rows():
             scientificname = ''
@@ -245,18 +589,15 @@ class Species(object):
                     #
                     if sizeclass:
 #                         sizeclassfound = False
-                        if 'size_classes' in taxon:
-                            for sizeclassdict in taxon['size_classes']:
-                                if sizeclassdict.get('bvol_size_class', '') == sizeclass:
-                                    if sizeclassdict.get('trophic_type', ''):
-                                        if scientificname == taxon['scientific_name']:
-#                                             toolbox_utils.Logging().warning('Same taxon/size on multiple rows: ' + scientificname + ' Size: ' + sizeclass + '   (Source: ' + excel_file_name + ')')
-#                                             sizeclassfound = True
-                                            break
-                                    #
-                                    sizeclassdict['trophic_type'] = trophictype
-#                                     sizeclassfound = True
-                                    break
+                        sizeclassdict = self._bvol_lookup.get((scientificname, sizeclass), None)
+                        if sizeclassdict is not None:
+                            if sizeclassdict.get('trophic_type', '') and \
+                               (scientificname == taxon['scientific_name']):
+#                                 toolbox_utils.Logging().warning('Same taxon/size on multiple rows: ' + scientificname + ' Size: ' + sizeclass + '   (Source: ' + excel_file_name + ')')
+                                pass
+                            else:
+                                sizeclassdict['trophic_type'] = trophictype
+#                             sizeclassfound = True
                         #
 #                         if sizeclassfound == False:
 #                             toolbox_utils.Logging().warning('Size class is missing: ' + scientificname + ' Size: ' + sizeclass + '   (Source: ' + excel_file_name + ')')
@@ -271,7 +612,7 @@ class Species(object):
 
     def _load_taxa(self, excel_file_name):
         """ Creates one data object for each taxon. """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         header = tablefilereader.header()
         for row in tablefilereader.rows():
@@ -308,7 +649,7 @@ class Species(object):
 
     def _load_synonyms(self, excel_file_name):
         """ Add synonyms from 'translate_' or 'synonyms_' files. """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         for row in tablefilereader.rows():
             toname = ''
@@ -340,7 +681,7 @@ class Species(object):
                     
     def _load_harmful(self, excel_file_name):
         """ Adds info about harmfulness to the species objects. """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         header = tablefilereader.header()
         for row in tablefilereader.rows():
@@ -369,7 +710,7 @@ class Species(object):
 
     def _load_plankton_group_definition(self, excel_file_name):
         """ """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         for row in tablefilereader.rows():
             scientificname = ''
@@ -392,51 +733,70 @@ class Species(object):
     
     def _precalculate_data(self):
         """ Calculates data from loaded datasets. I.e. phylum, class and order info. """
-        for speciesobject in self._taxa.values():
-            scientificname = ''
+        self._create_ancestor_lookup()
+        classificationkeys = dict(self._classification_keys)
+        for scientificname, speciesobject in self._taxa.items():
             try:
-                scientificname = speciesobject['scientific_name']
-                counter = 0
-                parentobject = speciesobject
-                while parentobject:
-                    counter += 1
-                    if counter > 20:
-                        parentobject = None # Too many levels, or infinite loop.
-#                         print('DEBUG: Species._precalculate_data(): Too many levels, or infinite loop.')
-                        continue
-                    if 'rank' in parentobject:
-                        if parentobject['rank'] == 'Species':
-                            speciesobject['taxon_species'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Genus':
-                            speciesobject['taxon_genus'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Family':
-                            speciesobject['taxon_family'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Order':
-                            speciesobject['taxon_order'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Class':
-                            speciesobject['taxon_class'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Phylum':
-                            speciesobject['taxon_phylum'] = parentobject['scientific_name']
-                        if parentobject['rank'] == 'Kingdom':
-                            speciesobject['taxon_kingdom'] = parentobject['scientific_name']
-                            parentobject = None # Done. Continue with next.
-                            continue
-                    # One step up in hierarchy.
-                    if 'parent_name' in parentobject:
-                        if parentobject['parent_name'] in self._taxa:
-                            parentobject = self._taxa[parentobject['parent_name']] if parentobject['parent_name'] else None
-                        else:
-                            if parentobject['scientific_name'] != 'Biota':
-                                toolbox_utils.Logging().warning('Parent taxon is missing for : ' + parentobject['scientific_name'])
-                            parentobject = None
-                    else:
-                        parentobject = None
+                for rank, ancestorname in self._ancestor_lookup.get(scientificname, {}).items():
+                    key = classificationkeys.get(rank, None)
+                    if key:
+                        speciesobject[key] = ancestorname
             except:
                 toolbox_utils.Logging().warning('Failed when creating classification. Taxon: ' + scientificname)
 
+    def _create_ancestor_lookup(self):
+        """ Creates a dictionary for each taxon with rank: scientific name, for the taxon 
+            and all taxa above it in the hierarchy. Parents are calculated first and reused. 
+            If a rank is used on multiple levels the highest one is used, and Kingdom is 
+            the highest level used. """
+        ancestorlookup = {}
+        taxa = self._taxa
+        for scientificname in taxa:
+            if scientificname in ancestorlookup:
+                continue
+            # Walk up until a taxon with known ancestors is found.
+            chain = []
+            taxonname = scientificname
+            ancestors = {}
+            while True:
+                if taxonname in ancestorlookup:
+                    ancestors = ancestorlookup[taxonname]
+                    if ancestors is None:
+                        # Marked as started below.
+                        toolbox_utils.Logging().warning('Loop in classification for: ' + taxonname)
+                        ancestors = {}
+                    break
+                taxonobject = taxa[taxonname]
+                chain.append(taxonobject)
+                ancestorlookup[taxonname] = None # Started.
+                if taxonobject.get('rank', '') == 'Kingdom':
+                    break # Done. Kingdom is the highest level used.
+                parentname = taxonobject.get('parent_name', '')
+                if parentname not in taxa:
+                    if taxonname != 'Biota':
+                        toolbox_utils.Logging().warning('Parent taxon is missing for : ' + taxonname)
+                    break
+                taxonname = parentname
+            # Calculate from the top.
+            for taxonobject in reversed(chain):
+                rank = taxonobject.get('rank', '')
+                if rank and (rank not in ancestors):
+                    ancestors = {**ancestors, rank: taxonobject['scientific_name']}
+                # Shared with the parent if no rank is added. Should not be modified.
+                ancestorlookup[taxonobject['scientific_name']] = ancestors
+        self._ancestor_lookup = ancestorlookup
+
+    def get_ancestor_at_rank(self, scientific_name, rank):
+        """ Returns the name of the taxon at the rank, i.e. 'Genus' or 'Class', or the 
+            taxon itself if it has that rank. Synonyms are translated. Empty string if not found. """
+        taxonobject = self._taxa_lookup.get(scientific_name, None)
+        if taxonobject is None:
+            return ''
+        return self._ancestor_lookup.get(taxonobject.get('scientific_name', ''), {}).get(rank, '')
+
     def _load_bvol_columns(self, excel_file_name):
         """ """
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         for row in tablefilereader.rows():
             columnname = ''
@@ -456,7 +816,7 @@ class Species(object):
         """ Adds BVOL data to species objects. Creates additional species objects if missing 
             (i.e. for Unicell, Flagellates). """
         # Import size class data.
-        tablefilereader = toolbox_utils.TableFileReader(excel_file_name = excel_file_name)
+        tablefilereader = self._get_table_file_reader(excel_file_name)
         #
         # Create header list for mapping and translations.
         headerinfo = [] # Contains used columns only.
@@ -531,6 +891,17 @@ class Species(object):
             except:
                 toolbox_utils.Logging().warning('Failed when loading BVOL data.')
 
+    def _create_bvol_lookup(self):
+        """ Creates the (scientific_name, size_class) index used by get_bvol_dict(), etc. 
+            All names in the taxa lookup are used, i.e. synonyms. The first size class 
+            is used if a size class is added twice. """
+        self._bvol_lookup = {}
+        for scientificname, speciesobject in self._taxa_lookup.items():
+            for sizeclassobject in speciesobject.get('size_classes', []):
+                key = (scientificname, sizeclassobject.get('bvol_size_class', ''))
+                if key not in self._bvol_lookup:
+                    self._bvol_lookup[key] = sizeclassobject
+
     def get_plankton_group_from_taxon_name(self, scientific_name):
         """ This is another way to organize organisms into groups. Other than the traditional classification. """
         #
@@ -563,7 +934,13 @@ class Species(object):
             except: 
                 pass
         #                            
-        toolbox_utils.Logging().warning('Not match for Plankton group. "OTHERS" assigned for: ' + scientific_name)
+        item = scientific_name
+        if scientific_name and (scientific_name not in self._taxa_lookup):
+            similarnames = self.get_similar_taxon_names(scientific_name, max_count = 3)
+            if similarnames:
+                item += '   (Similar names: ' + ', '.join(name for name, _similarity in similarnames) + ')'
+        # Accumulated to one row for all taxa.
+        toolbox_utils.Logging().warning('Not match for Plankton group. "OTHERS" assigned for', item = item)
         self._planktongroups_lookup[scientific_name] = 'OTHERS'
         return 'OTHERS'
 
@@ -595,3 +972,133 @@ class Species(object):
         #
         return name, version
 
+
+def _log_lookup_statistics():
+    """ Summary callback for the lookup statistics. Uses the current instance, 
+        the instance is replaced by Species.reload(). """
+    Species().log_lookup_statistics()
+
+
+@toolbox_utils.singleton
+class SpeciesLoader(QtCore.QObject):
+    """ 
+    Loads the species lists in a background thread. 
+    Species() can be used as before from anywhere. If called before the background 
+    loading is finished it will wait for it, otherwise it returns directly.
+    The signal speciesLoaded is emitted when loading is finished, also if it failed.
+    The signal speciesReloaded is emitted when reload() is finished, also if it failed. 
+    Accumulated log rows are kept for each thread in toolbox_utils.Logging, the loading 
+    thread does not affect accumulated rows for imports etc. in the main thread.
+    """
+    speciesLoaded = QtCore.pyqtSignal()
+    speciesReloaded = QtCore.pyqtSignal()
+    
+    def __init__(self):
+        """ """
+        QtCore.QObject.__init__(self)
+        self._future = None
+        self._reload_future = None
+        self._lock = threading.Lock()
+        
+    def start(self):
+        """ Starts loading in a background thread, if not already started. 
+            Returns a concurrent.futures.Future with the Species object as result. """
+        with self._lock:
+            if self._future is None:
+                self._future = concurrent.futures.Future()
+                self._future.add_done_callback(self._loading_done)
+                # Daemon thread. Should not prevent the application from closing.
+                thread = threading.Thread(target = self._load, 
+                                          name = 'SpeciesLoader', 
+                                          daemon = True)
+                thread.start()
+            return self._future
+    
+    def get_future(self):
+        """ Returns the future for the background loading. Starts loading if needed. """
+        return self.start()
+    
+    def reload(self):
+        """ Reloads the species lists in a background thread. See Species.reload(). 
+            Returns a future. A reload already running is reused. """
+        with self._lock:
+            if (self._reload_future is None) or self._reload_future.done():
+                self._reload_future = concurrent.futures.Future()
+                self._reload_future.add_done_callback(self._reloading_done)
+                thread = threading.Thread(target = self._reload, 
+                                          args = (self._reload_future,), 
+                                          name = 'SpeciesReloader', 
+                                          daemon = True)
+                thread.start()
+            return self._reload_future
+    
+    def is_loaded(self):
+        """ True if loading is finished without errors. Does not block. """
+        future = self._future
+        if (future is None) or (not future.done()):
+            return False
+        return future.exception() is None
+    
+    def wait(self, timeout = None):
+        """ Blocks until the species lists are loaded and returns the Species object. 
+            Loading is done in the calling thread if the background loading is 
+            not started. """
+        if self._future is None:
+            return Species()
+        self._future.result(timeout) # Raises the exception if loading failed.
+        return Species() # The instance is replaced by reload().
+    
+    def _load(self):
+        """ Executed in the background thread. """
+        if not self._future.set_running_or_notify_cancel():
+            return
+        try:
+            self._future.set_result(Species())
+        except Exception as e:
+            self._future.set_exception(e)
+    
+    def _reload(self, future):
+        """ Executed in the background thread. """
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            species = self.wait() # Initial loading must be finished.
+            future.set_result(species.reload())
+        except Exception as e:
+            future.set_exception(e)
+    
+    def _reloading_done(self, future):
+        """ Called in the background thread. """
+        exception = future.exception()
+        if exception is not None:
+            toolbox_utils.Logging().error('Failed to reload species lists, old lists are used: ' + str(exception))
+        self.speciesReloaded.emit()
+    
+    def _loading_done(self, future):
+        """ Called in the background thread. Qt will call the slots connected to 
+            speciesLoaded in their own thread. """
+        exception = future.exception()
+        if exception is not None:
+            toolbox_utils.Logging().error('Failed to load species lists: ' + str(exception))
+        self.speciesLoaded.emit()
+
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Benchmark for cold start loading of the species files, with and without 
+        the process pool. The cache is not used. 
+        Run from the toolbox directory: python -m plankton_core.species
+    """
+    species = Species()
+    results = {}
+    for parallel in [False, True]:
+        species._parallel_loading = parallel
+        starttime = time.time()
+        species._load_all_data(use_cache = False)
+        print('Parallel loading: ' + str(parallel) + 
+              '   Time: ' + str(round(time.time() - starttime, 2)) + ' s' +
+              '   CPUs: ' + str(os.cpu_count()))
+        results[parallel] = pickle.dumps((species._taxa, species._planktongroups_rank_dict))
+    print('Identical result: ' + str(results[False] == results[True]))
@@ -7,6 +7,7 @@
 # Version for "Plankton toolbox - desktop application".
 __version__ = '1.3.3'
 
+import multiprocessing
 # Matplotlib for PyQt5. 
 # Backend must be defined before other matplotlib imports.
 import matplotlib
@@ -18,5 +19,7 @@ import numpy
 import app_framework
 
 if __name__ == "__main__":
+    # Process pools are used when loading files. Needed for the frozen Windows version.
+    multiprocessing.freeze_support()
     app_framework.set_version(__version__)
     app_framework.desktop_application()
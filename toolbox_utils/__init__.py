@@ -10,8 +10,12 @@
 
 from toolbox_utils.patterns import singleton
 from toolbox_utils.toolbox_logging import Logging
+from toolbox_utils.date_parser import DateParser
+from toolbox_utils.ngram_index import NgramIndex
+from toolbox_utils.prefix_index import PrefixIndex
 
 from toolbox_utils.table_file_reader import TableFileReader
+from toolbox_utils.table_file_reader import read_excel_files
 from toolbox_utils.table_file_writer import TableFileWriter
 
 from toolbox_utils.graphplotter import GraphPlotData
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+# Project: http://plankton-toolbox.org
+# Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import datetime
+import functools
+import toolbox_utils
+
+# This utility should work even if dateutil is not installed, but only for the fixed formats.
+dateutil_installed = True
+try:
+    import dateutil.parser
+except ImportError:
+    dateutil_installed = False
+    print('Only ISO dates supported since dateutil is not installed.')
+
+@toolbox_utils.singleton
+class DateParser(object):
+    """
+    Utility class for converting date strings to datetime objects.
+    Datasets often contains a few hundred distinct dates in millions of rows.
+    Results are therefore cached for each distinct string in a bounded LRU cache.
+    The fixed formats '2000-01-01', '20000101' and '2000-01-01 12:00:00' are
+    converted directly. The ISO formats are also accepted without zero padding,
+    i.e. '2000-1-1'. dateutil is only used as fallback for other formats.
+    """
+    def __init__(self, cache_size = 4096):
+        """ """
+        self._parse_cached = functools.lru_cache(maxsize = cache_size)(self._parse)
+        self._iso_date_cached = functools.lru_cache(maxsize = cache_size)(self._iso_date)
+
+    def parse_datetime(self, date_string, use_fallback = True):
+        """ Returns a datetime object, or None if the string can't be converted.
+            use_fallback = False: Only the fixed formats are accepted. """
+        try:
+            return self._parse_cached(date_string, use_fallback)
+        except TypeError:
+            return None # Not hashable.
+
+    def to_iso_date(self, date_string, use_fallback = True):
+        """ Returns the date on the ISO format (2000-01-01), or None if the
+            string can't be converted. """
+        try:
+            return self._iso_date_cached(date_string, use_fallback)
+        except TypeError:
+            return None # Not hashable.
+
+    def clear_cache(self):
+        """ """
+        self._parse_cached.cache_clear()
+        self._iso_date_cached.cache_clear()
+
+    def _iso_date(self, date_string, use_fallback):
+        """ Private method. Use to_iso_date() above. """
+        value = self._parse_cached(date_string, use_fallback)
+        if value is None:
+            return None
+        return value.strftime('%Y-%m-%d')
+
+    def _parse(self, date_string, use_fallback):
+        """ Private method. Use parse_datetime() above. """
+        if not isinstance(date_string, str):
+            return None
+        value = date_string.strip()
+        length = len(value)
+        try:
+            # Fixed formats.
+            if (length == 10) and (value[4] == '-') and (value[7] == '-'):
+                # '2000-01-01'.
+                if value[0:4].isdigit() and value[5:7].isdigit() and value[8:10].isdigit():
+                    return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+            elif (length == 8) and value.isdigit():
+                # '20000101'.
+                return datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+            elif (length == 19) and (value[4] == '-') and (value[7] == '-'):
+                # '2000-01-01 12:00:00'.
+                return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass # Try fallback, i.e. for '2000-02-30'.
+        # ISO formats without zero padding, i.e. '2000-1-1'.
+        if '-' in value:
+            for date_format in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S']:
+                try:
+                    return datetime.datetime.strptime(value, date_format)
+                except ValueError:
+                    pass
+        # Other formats.
+        if use_fallback and dateutil_installed and value:
+            try:
+                return dateutil.parser.parse(value)
+            except (ValueError, OverflowError):
+                pass
+        #
+        return None
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. """
+
+    dateparser = DateParser()
+    for date_string in ['2000-01-31', '20000131', '2000-01-31 12:30:00',
+                        '2000-1-1', '2000-1-1 1:00:00', 
+                        '31 Jan 2000', '2000-02-30', 'not a date']:
+        print(date_string + ': ' +
+              str(dateparser.to_iso_date(date_string)) + ' / ' +
+              str(dateparser.parse_datetime(date_string, use_fallback = False)))
+    print('Cache: ' + str(dateparser._parse_cached.cache_info()))
@@ -5,7 +5,6 @@
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
 import numpy.ma
-import datetime
 import copy
 # import matplotlib as mpl
 import matplotlib.dates as mpl_dates
@@ -322,14 +321,12 @@ class ChartBase(object):
             datetime_array = []
             failedconversions_set = set() # Used in error log.
             for timestring in data_array:
-                try:
-                    try:
-                        time = datetime.datetime.strptime(timestring, '%Y-%m-%d')
-                    except: 
-                        time = datetime.datetime.strptime(timestring, '%Y-%m-%d %H:%M:%S')
-                    datetime_array.append(time)
-                except:
+                # Cached for each distinct date string.
+                time = toolbox_utils.DateParser().parse_datetime(timestring, use_fallback = False)
+                if time is None:
                     failedconversions_set.add(str(timestring))
+                else:
+                    datetime_array.append(time)
             #
             if len(failedconversions_set) > 0:
                 toolbox_utils.Logging().warning('GraphPlotter.ChartBase: These values could not be converted to date or datetime: "' + 
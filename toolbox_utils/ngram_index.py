@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+# Project: http://plankton-toolbox.org
+# Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import collections
+import itertools
+
+class NgramIndex(object):
+    """
+    Index for fuzzy matching of strings, for example misspelled taxon names.
+    Each string is split into n-grams (trigrams as default) and an inverted index 
+    is created from n-gram to the strings containing it. Only strings sharing 
+    n-grams with the searched string are compared, i.e. no pairwise comparison 
+    against all strings in the index.
+    Similarity is calculated as shared n-grams / all distinct n-grams in both 
+    strings (Jaccard), 1.0 for identical strings. Case and whitespace are ignored.
+    """
+    def __init__(self, strings = None, n = 3):
+        """ """
+        self._n = n
+        self._strings = [] # Original strings. Position is used as id.
+        self._ngram_counts = [] # Number of distinct n-grams for each string.
+        self._postings = {} # Key: n-gram. Value: list of string ids.
+        self._string_ids = {} # Key: original string. Used to avoid duplicates.
+        if strings:
+            self.add_strings(strings)
+
+    def add_strings(self, strings):
+        """ """
+        postings = self._postings
+        for string in strings:
+            if (not string) or (string in self._string_ids):
+                continue
+            stringid = len(self._strings)
+            self._string_ids[string] = stringid
+            self._strings.append(string)
+            ngrams = self._get_ngrams(string)
+            self._ngram_counts.append(len(ngrams))
+            for ngram in ngrams:
+                idlist = postings.get(ngram)
+                if idlist is None:
+                    postings[ngram] = [stringid]
+                else:
+                    idlist.append(stringid)
+
+    def get_string_count(self):
+        """ """
+        return len(self._strings)
+
+    def find_similar(self, string, max_count = 5, min_similarity = 0.4):
+        """ Returns a list of (string, similarity) tuples. Sorted with the most 
+            similar first, and by string when equal. """
+        ngrams = self._get_ngrams(string)
+        if not ngrams:
+            return []
+        # Count shared n-grams for all strings sharing at least one.
+        postings_get = self._postings.get
+        shared = collections.Counter(itertools.chain.from_iterable(
+                                        postings_get(ngram, ()) for ngram in ngrams))
+        #
+        querycount = len(ngrams)
+        ngramcounts = self._ngram_counts
+        strings = self._strings
+        result = []
+        for stringid, sharedcount in shared.items():
+            similarity = sharedcount / (querycount + ngramcounts[stringid] - sharedcount)
+            if similarity >= min_similarity:
+                result.append((strings[stringid], similarity))
+        result.sort(key = lambda item: (-item[1], item[0]))
+        return result[:max_count]
+
+    def find_best_match(self, string, min_similarity = 0.8):
+        """ Returns the most similar string, or None if below min_similarity. """
+        result = self.find_similar(string, max_count = 1, min_similarity = min_similarity)
+        if result:
+            return result[0][0]
+        return None
+
+    def _get_ngrams(self, string):
+        """ Distinct n-grams for a normalized string. Padded to make the 
+            first and last characters more significant. """
+        normalized = ' '.join(str(string).lower().split())
+        if not normalized:
+            return set()
+        padded = ' ' * (self._n - 1) + normalized + ' '
+        n = self._n
+        return {padded[index:index + n] for index in range(len(padded) - n + 1)}
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. Run from the toolbox directory: python -m toolbox_utils.ngram_index """
+    import random
+    from string import ascii_lowercase, ascii_uppercase
+    import time
+
+    random.seed(1)
+    names = set()
+    while len(names) < 50000:
+        genus = random.choice(ascii_uppercase) + ''.join(random.choice(ascii_lowercase) for _ in range(random.randint(4, 10)))
+        species = ''.join(random.choice(ascii_lowercase) for _ in range(random.randint(4, 12)))
+        names.add(genus + ' ' + species)
+    names = sorted(names)
+    names.append('Skeletonema marinoi')
+    #
+    starttime = time.time()
+    index = NgramIndex(names)
+    print('Index for ' + str(index.get_string_count()) + ' strings: ' + str(round(time.time() - starttime, 3)) + ' s')
+    starttime = time.time()
+    for misspelled in ['Skeletonema marinio', 'skeletonema  marinoi', 'Skeltonema marinoi', 'Skeletonema']:
+        print(misspelled + ': ' + str(index.find_similar(misspelled, max_count = 3)))
+    print('Time per search: ' + str(round((time.time() - starttime) / 4 * 1000, 2)) + ' ms')
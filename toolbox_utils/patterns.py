@@ -4,6 +4,8 @@
 # Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute 
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
+import threading
+
 def singleton(cls):
     """
     This is an implementation of the Singleton pattern by using decorators.
@@ -11,10 +13,24 @@ def singleton(cls):
         @singleton
         class MyClass:
            ...               
+    The instance is created only once, also when it is requested from different 
+    threads. A thread asking for the instance while it is created in another 
+    thread will wait until it is ready.
+    The instance can be replaced with MyClass.replace_instance(new_instance), i.e. 
+    when reloading. Code that already holds the old instance continues to use it.
     """
     instances = {}
+    lock = threading.RLock()
     def getinstance():
-        if cls not in instances:
-            instances[cls] = cls()
-        return instances[cls]
+        instance = instances.get(cls)
+        if instance is None:
+            with lock:
+                if cls not in instances:
+                    instances[cls] = cls()
+                instance = instances[cls]
+        return instance
+    def replace_instance(instance):
+        with lock:
+            instances[cls] = instance
+    getinstance.replace_instance = replace_instance
     return getinstance
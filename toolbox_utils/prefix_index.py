@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+# Project: http://plankton-toolbox.org
+# Copyright (c) 2010-2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import bisect
+
+class PrefixIndex(object):
+    """
+    Sorted index for type-ahead search, for example in taxon name lists.
+    Matching is case insensitive. With word_prefixes = True all words in the 
+    strings are indexed, i.e. 'mar' will match 'Skeletonema marinoi'. 
+    A search is done with two binary searches in the sorted keys, the cost 
+    depends on the number of matches and not on the size of the list.
+    """
+    def __init__(self, strings = None, word_prefixes = True):
+        """ """
+        self._word_prefixes = word_prefixes
+        self._strings = []
+        self._normalized = [] # Lower case strings, same order as strings.
+        self._keys = [] # Sorted lower case keys.
+        self._ids = [] # Position in strings for each key.
+        if strings:
+            self.set_strings(strings)
+
+    def set_strings(self, strings):
+        """ Replaces the content of the index. The position in the list is used as id. """
+        self._strings = list(strings)
+        self._normalized = [' '.join(str(string).lower().split()) for string in self._strings]
+        keyids = []
+        for stringid, key in enumerate(self._normalized):
+            if not key:
+                continue
+            keyids.append((key, stringid))
+            if self._word_prefixes:
+                # Also index from the start of each following word.
+                position = key.find(' ')
+                while position >= 0:
+                    keyids.append((key[position + 1:], stringid))
+                    position = key.find(' ', position + 1)
+        keyids.sort()
+        self._keys = [key for key, _stringid in keyids]
+        self._ids = [stringid for _key, stringid in keyids]
+
+    def get_strings(self):
+        """ """
+        return self._strings
+
+    def get_string_count(self):
+        """ """
+        return len(self._strings)
+
+    def find(self, prefix):
+        """ Returns a sorted list of ids (positions in the indexed list) for 
+            strings matching the prefix. All ids are returned for an empty prefix. """
+        prefix = ' '.join(str(prefix).lower().split())
+        if not prefix:
+            return list(range(len(self._strings)))
+        first = bisect.bisect_left(self._keys, prefix)
+        # All keys starting with prefix are sorted before prefix + highest character.
+        last = bisect.bisect_left(self._keys, prefix + '\U0010ffff', first)
+        if self._word_prefixes:
+            return sorted(set(self._ids[first:last]))
+        return sorted(self._ids[first:last])
+
+    def find_substring(self, text):
+        """ Returns a sorted list of ids for strings containing the text anywhere. 
+            Not indexed, all strings are checked. """
+        text = ' '.join(str(text).lower().split())
+        return [stringid for stringid, key in enumerate(self._normalized) if text in key]
+
+    def find_strings(self, prefix):
+        """ Returns matching strings, in the same order as when indexed. """
+        strings = self._strings
+        return [strings[stringid] for stringid in self.find(prefix)]
+
+
+# ===== TEST =====
+
+if __name__ == "__main__":
+    """ Used for testing. Run from the toolbox directory: python -m toolbox_utils.prefix_index """
+    import random
+    import string
+    import time
+
+    random.seed(1)
+    names = set()
+    while len(names) < 50000:
+        genus = random.choice(string.ascii_uppercase) + ''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(4, 10)))
+        species = ''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(4, 12)))
+        names.add(genus + ' ' + species)
+    names = sorted(names) + ['Skeletonema marinoi', 'Skeletonema costatum']
+    #
+    starttime = time.time()
+    index = PrefixIndex(names)
+    print('Index for ' + str(index.get_string_count()) + ' strings: ' + str(round(time.time() - starttime, 3)) + ' s')
+    for prefix in ['Skeletonema', 'skeletonema m', 'marin', 'Sk', 's', '']:
+        starttime = time.time()
+        result = index.find_strings(prefix)
+        print(repr(prefix) + ': ' + str(len(result)) + ' matches ' + str(result[:2]) + 
+              '   Time: ' + str(round((time.time() - starttime) * 1000, 3)) + ' ms')
@@ -5,9 +5,15 @@
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
 import os
+import io
+import codecs
 import locale
 import zipfile
+import itertools
 import pathlib
+import multiprocessing
+import concurrent.futures
+import toolbox_utils
 
 # This utility should work even if openpyxl is not installed, but with no Excel support.
 openpyxl_installed = True
@@ -22,6 +28,10 @@ class TableFileReader():
     This class can read table oriented data from text files, Excel files or from text entries in zip files.
     The class will hold the result and it is accessible through the 'self.header()' and 'self.rows()' methods.
     It is possible to minimise the memory footprint by only loading selected columns, by name or index. 
+    With 'stream_rows = True' only the header is read in the constructor, and rows are read from the file
+    one at a time by iterating over 'self.iterate_rows()', or in blocks of rows with 'self.read_chunks()'. 
+    Lines in text files and zip entries are split on the field delimiter. A BOM in the file overrides 
+    the 'encoding' parameter.
     Directories based on the loaded data can be directly generated by the class.
      
     For usage examples see the test part at the end of the source code file.
@@ -42,6 +52,7 @@ class TableFileReader():
                 header_row = 0, # Header at row index.
                 data_rows_from = 1, # First data row at row index.
                 data_rows_to = None, # None = Read all rows.
+                stream_rows = False, # True = Don't load rows, use iterate_rows(). 
                  ):
         """ """
         self._file_path = file_path
@@ -58,9 +69,12 @@ class TableFileReader():
         self._header_row = header_row
         self._data_rows_from = data_rows_from
         self._data_rows_to = data_rows_to
+        self._stream_rows = stream_rows
         #
         self._header = []
+        self._file_header = []
         self._rows = []
+        self._pending_rows = None # Rows not yet read when streaming.
         # Read data from file.
         self.read_file()
     
@@ -68,30 +82,82 @@ class TableFileReader():
         """ Header as list. """
         return self._header
     
+    def file_header(self):
+        """ Header as in the file, before columns are selected. """
+        return self._file_header
+    
     def rows(self):
-        """ Rows as a list of lists. """
+        """ Rows as a list of lists. Empty when streaming, use iterate_rows(). """
         return self._rows
     
+    def iterate_rows(self):
+        """ Iterator over rows. When streaming, rows are read from the file 
+            one at a time and the file is read again if called multiple times. """
+        if not self._stream_rows:
+            return iter(self._rows)
+        # Continue after the header already read in the constructor.
+        if self._pending_rows is not None:
+            rows = self._pending_rows
+            self._pending_rows = None
+            return rows
+        rows = self._iterate_file()
+        next(rows, None) # Skip header.
+        return rows
+    
+    def read_chunks(self, chunk_size = 10000):
+        """ Iterator over blocks of rows, as lists with up to chunk_size rows. All chunks 
+            have the columns in header(). Use with 'stream_rows = True' to process large 
+            files with memory use based on the chunk size instead of the file size. """
+        if chunk_size < 1:
+            raise UserWarning('Chunk size must be 1 or more. Chunk size: ' + str(chunk_size))
+        rows = self.iterate_rows()
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            if self._stream_rows:
+                rows.close() # Closes the file, also if not all chunks are read.
+    
     def clear(self):
         """ Call this to free memory. """
         self._header = []
+        self._file_header = []
         self._rows = []
+        if self._pending_rows is not None:
+            self._pending_rows.close() # Closes the file.
+            self._pending_rows = None
         
     def read_file(self):
         """ Read files in different formats depending on parameter values
             defined in constructor. """
+        if (self._text_file_name is None) and \
+           (self._excel_file_name is None) and \
+           (not self._zip_file_name):
+#             raise UserWarning('File name is missing.')
+            print('Warning: TableFileReader.reload_file: File name is missing.')
+            return
+        # The first item is the header, followed by rows.
+        rows = self._iterate_file()
+        self._header = next(rows, [])
+        if self._stream_rows:
+            self._pending_rows = rows
+        else:
+            self._rows = list(rows)
+    
+    def _iterate_file(self):
+        """ Private method. Generator, the header is returned first and then one row at a time. """
         # Text file.                
         if self._text_file_name is not None:
-            (self._header, self._rows) = self._read_text_file()
+            return self._iterate_text_file()
         # Excel.    
         elif self._excel_file_name is not None:
-            (self._header, self._rows) = self._read_excel_file()
+            return self._iterate_excel_file()
         # Text file in zip.    
-        elif self._zip_file_name:
-            (self._header, self._rows) = self._read_zip_entry()
         else:
-#             raise UserWarning('File name is missing.')
-            print('Warning: TableFileReader.reload_file: File name is missing.')
+            return self._iterate_zip_entry()
 
     def create_dictionary(self,
                         # By name. One item.
@@ -151,10 +217,8 @@ class TableFileReader():
     def translate_rows(self, from_to_dict):
         """ TODO: """
         
-    def _read_text_file(self):
-        """ Private method. Use read_file() above. """
-        table_header = [] 
-        table_rows = []
+    def _iterate_text_file(self):
+        """ Private method. Use read_file() or iterate_rows() above. """
         # File path and name.
         filename = self._text_file_name
         if self._file_path and self._text_file_name:
@@ -166,50 +230,53 @@ class TableFileReader():
         # Get encoding.
         if self._encoding is None:
             self._encoding = locale.getpreferredencoding()
-        # 
-        columnsbyindex = None
+        with open(filename, 'rb') as infile:
+            encoding = self._get_encoding(infile.read(4))
         # Read file.
-#         with open(filename, 'r') as infile:
-#             fielddelimiter = None
-#             # Iterate over rows in file.            
-#             for rowindex, row in enumerate(infile):
-#                 if (self._data_rows_to is not None) and (rowindex > self._data_rows_to):
-#                     break # Break loop if data_row_to is defined and exceeded.
-#                 # Convert to str.
-# 
-# 
-# 
-# #                 row = str(row, self._encoding, self._encoding_error_handling)
-# #                 row = row.encode(self._encoding, self._encoding_error_handling).decode('UTF-16')
-# #                 row = str(row.encode(self._encoding, self._encoding_error_handling))
-# ##                row = str(row, encoding=self._encoding, errors=self._encoding_error_handling)
-
-        with pathlib.Path(filename).open('r', encoding='cp1252') as infile:
-            fielddelimiter = None
-            # Iterate over rows in file. 
-            rowindex = -1           
-            for row in infile:
-                rowindex += 1
-                if (self._data_rows_to is not None) and (rowindex > self._data_rows_to):
-                    break # Break loop if data_row_to is defined and exceeded.
-                
-                if rowindex == self._header_row:
-                    # Header.
-                    fielddelimiter = self._get_field_delimiter(row)
-                    row = [item.strip() for item in row.split(fielddelimiter)]
-                    columnsbyindex = self._prepare_columnsbyindex(row)
-                    table_header = self._get_row_based_on_columnsbyindex(row, columnsbyindex)
-                elif rowindex >= self._data_rows_from:
-                    # Row.
-                    if len(row.strip()) == 0: 
-                        continue # Don't add empty rows.
-                    row = [item.strip() for item in row.split(fielddelimiter)]
-                    table_rows.append(self._get_row_based_on_columnsbyindex(row, columnsbyindex))
-        #                                                      
-        return (table_header, table_rows)
+        with pathlib.Path(filename).open('r', encoding = encoding, 
+                                         errors = self._encoding_error_handling) as infile:
+            yield from self._iterate_text_rows(infile)
+    
+    def _iterate_text_rows(self, text_file):
+        """ Private method. Used for text files and text entries in zip files. """
+        # The field delimiter is detected from the header.
+        headerlines = list(itertools.islice(text_file, self._header_row + 1))
+        headerline = headerlines[-1] if len(headerlines) > self._header_row else ''
+        fielddelimiter = self._get_field_delimiter(headerline)
+        #
+        lines = itertools.chain(headerlines, text_file)
+        rows = map(str.split, lines, itertools.repeat(fielddelimiter))
+        #
+        columnsbyindex = None
+        minrowlength = None # Selected columns are picked directly from rows with this length.
+        # Iterate over rows in file. 
+        for rowindex, row in enumerate(rows):
+            if (self._data_rows_to is not None) and (rowindex > self._data_rows_to):
+                break # Break loop if data_row_to is defined and exceeded.
+            #
+            if rowindex == self._header_row:
+                # Header.
+                row = [item.strip() for item in row]
+                columnsbyindex = self._prepare_columnsbyindex(row)
+                if columnsbyindex and (None not in columnsbyindex):
+                    minrowlength = max(columnsbyindex) + 1
+                yield self._get_row_based_on_columnsbyindex(row, columnsbyindex)
+            elif rowindex >= self._data_rows_from:
+                # Row.
+                if not (row and row[0].strip()) and not fielddelimiter.join(row).strip(): 
+                    continue # Don't add empty lines. The first test is the fast path.
+                # Only selected columns are stripped.
+                if columnsbyindex is None:
+                    yield [item.strip() for item in row]
+                elif (minrowlength is not None) and (len(row) >= minrowlength):
+                    yield [row[index].strip() for index in columnsbyindex]
+                else:
+                    row = self._get_row_based_on_columnsbyindex(row, columnsbyindex)
+                    yield [item.strip() for item in row]
     
     def _prepare_columnsbyindex(self, header_row):
         """ Private method. """
+        self._file_header = header_row
         columnsbyindex = None
         if self._select_columns_by_index:
             columnsbyindex = self._select_columns_by_index
@@ -241,11 +308,8 @@ class TableFileReader():
                     new_row.append('')
         return new_row
 
-    def _read_excel_file(self):
-        """ Private method. Use read_file() above. """
-        table_header = [] 
-        table_rows = []
-        #
+    def _iterate_excel_file(self):
+        """ Private method. Use read_file() or iterate_rows() above. """
         if openpyxl_installed == False:
             raise UserWarning('Can\'t read .xlsx files ("openpyxl" is not installed).')
         # File path and name.
@@ -257,7 +321,8 @@ class TableFileReader():
         if not os.path.exists(filename):
             raise UserWarning('File is not found.  File: ' + filename)
         # 
-        self._columnsbyindex = None
+        columnsbyindex = None
+        workbook = None
         #
         try:
 #             workbook = openpyxl.load_workbook(filename, use_iterators = True) # Supports big files.
@@ -294,7 +359,7 @@ class TableFileReader():
                             newrow.append(str(value).strip())
                     #
                     columnsbyindex = self._prepare_columnsbyindex(newrow)
-                    table_header = self._get_row_based_on_columnsbyindex(newrow, columnsbyindex)
+                    yield self._get_row_based_on_columnsbyindex(newrow, columnsbyindex)
                 elif rowindex >= self._data_rows_from:
                     # Row.
                     newrow = []
@@ -307,23 +372,19 @@ class TableFileReader():
                     #
                     if len(''.join(newrow)) == 0:
                         continue # Don't add empty rows.
-                    newrow = self._get_row_based_on_columnsbyindex(newrow, columnsbyindex)
-                    table_rows.append(newrow)
-            #
-            workbook._archive.close()
-            #
-            return (table_header, table_rows)
+                    yield self._get_row_based_on_columnsbyindex(newrow, columnsbyindex)
         #  
         except Exception as e:
             msg = 'Failed to read from file. File name: ' + filename + '. Exception: ' + str(e)
             print(msg)
             raise
+        finally:
+            # Also when the generator is closed before all rows are read.
+            if workbook is not None:
+                workbook._archive.close()
 
-    def _read_zip_entry(self):
-        """ Private method. Use read_file() above. """
-        table_header = [] 
-        table_rows = []
-        #
+    def _iterate_zip_entry(self):
+        """ Private method. Use read_file() or iterate_rows() above. """
         filename = self._zip_file_name
         if self._file_path and self._zip_file_name:
             filename = os.path.join(self._file_path, self._zip_file_name)
@@ -339,34 +400,28 @@ class TableFileReader():
                 raise UserWarning('The entry ' + self._zip_file_entry + ' is missing in ' + filename)
             #
             try:
-                fielddelimiter = None
+                with infile.open(self._zip_file_entry) as zipentry:
+                    encoding = self._get_encoding(zipentry.read(4))
                 # Iterate over rows in zip file entry.            
                 with infile.open(self._zip_file_entry) as zipentry:
-                    for rowindex, row in enumerate(zipentry):
-                        if (self._data_rows_to is not None) and (rowindex > self._data_rows_to):
-                            break # Break loop if data_row_to is defined and exceeded.
-                        # Convert to str.
-                        row = str(row, self._encoding, self._encoding_error_handling)
-                        if rowindex == self._header_row:
-                            # Header.
-                            fielddelimiter = self._get_field_delimiter(row)
-                            row = [item.strip() for item in row.split(fielddelimiter)]
-                            columnsbyindex = self._prepare_columnsbyindex(row)
-                            table_header = self._get_row_based_on_columnsbyindex(row, columnsbyindex)
-                        elif rowindex >= self._data_rows_from:
-                            # Row.
-                            if len(row.strip()) == 0: 
-                                continue # Don't add empty rows.
-                            row = [item.strip() for item in row.split(fielddelimiter)]
-                            table_rows.append(self._get_row_based_on_columnsbyindex(row, columnsbyindex))
+                    textentry = io.TextIOWrapper(zipentry, encoding = encoding, 
+                                                 errors = self._encoding_error_handling)
+                    yield from self._iterate_text_rows(textentry)
             #
             except Exception as e:
                 msg = 'Can\'t read zip file. Entry name: ' + self._zip_file_entry + '. Exception: ' + str(e)
                 print(msg)
                 raise UserWarning(msg)
-            #
 
-        return (table_header, table_rows)
+    def _get_encoding(self, first_bytes):
+        """ Private method. A byte order mark overrides the selected encoding. """
+        if first_bytes.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if first_bytes.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+            return 'utf-32'
+        if first_bytes.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        return self._encoding
 
     def _get_field_delimiter(self, header_row):
         """ Private method. """
@@ -380,6 +435,32 @@ class TableFileReader():
         return '\t' # Default.
 
 
+def read_excel_files(excel_file_names, max_workers = None):
+    """ Reads Excel files concurrently in a process pool, since parsing with openpyxl 
+        is CPU bound. Returns TableFileReader objects in the same order as the file names. 
+        max_workers = None: Number of CPUs. Files are read in this process if only one 
+        worker is used or if the process pool can't be started. 
+        Workers are started with 'spawn' on all platforms. The caller may run Qt and 
+        other threads, i.e. when species lists are loaded in the background, and such 
+        a process is not safe to fork. """
+    excel_file_names = list(excel_file_names)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(excel_file_names))
+    if max_workers > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers, 
+                        mp_context = multiprocessing.get_context('spawn')) as executor:
+                return list(executor.map(_read_excel_file, excel_file_names))
+        except (OSError, concurrent.futures.process.BrokenProcessPool):
+            pass # Read below instead.
+    return [_read_excel_file(excel_file_name) for excel_file_name in excel_file_names]
+
+def _read_excel_file(excel_file_name):
+    """ Used by read_excel_files(). Module level function, called in worker processes. """
+    return TableFileReader(excel_file_name = excel_file_name)
+
+
 # ===== TEST =====
 
 if __name__ == "__main__":
@@ -439,3 +520,56 @@ if __name__ == "__main__":
     except Exception as e:
         print('Test failed: ' + str(e))
 
+    print('\n=== TEST: Chunks. ===')
+    try:
+        tablefilereader = TableFileReader(
+                    file_path = '../test_data',
+                    zip_file_name = 'test_text_writer.zip', 
+                    zip_file_entry = 'test_text_writer.txt',
+                    stream_rows = True, 
+                    )
+        print('Header: ' + str(tablefilereader.header()))
+        for chunk in tablefilereader.read_chunks(chunk_size = 2):
+            print('Chunk:  ' + str(chunk))
+    except Exception as e:
+        print('Test failed: ' + str(e))
+
+    print('\n=== TEST: Streamed rows. ===')
+    try:
+        import tempfile
+        testdir = tempfile.mkdtemp()
+        content = 'Title row\naaa\tbbb\tccc\n\nA1\tB1\tC1\n\nA2\t\tC2\n\t\nA3\nA4\tB4\tC4\textra\n'
+        testfile = os.path.join(testdir, 'test_stream.txt')
+        with open(testfile, 'w', encoding = 'cp1252', newline = '') as outfile:
+            outfile.write(content)
+        testzip = os.path.join(testdir, 'test_stream.zip')
+        with zipfile.ZipFile(testzip, 'w') as outzip:
+            outzip.writestr('test_stream.txt', content.encode('cp1252'))
+        testexcel = None
+        if openpyxl_installed:
+            testexcel = os.path.join(testdir, 'test_stream.xlsx')
+            workbook = openpyxl.Workbook()
+            for line in content.splitlines():
+                workbook.active.append(line.split('\t') if line else [])
+            workbook.save(testexcel)
+        sources = [{'text_file_name': testfile}, 
+                   {'zip_file_name': testzip, 'zip_file_entry': 'test_stream.txt'}]
+        if testexcel:
+            sources.append({'excel_file_name': testexcel})
+        options = [{}, 
+                   {'select_columns_by_name': ['ccc', 'aaa', 'eee']}, 
+                   {'select_columns_by_index': [2, 0]}, 
+                   {'data_rows_to': 5}]
+        for source in sources:
+            for option in options:
+                loaded = TableFileReader(header_row = 1, data_rows_from = 2, **source, **option)
+                streamed = TableFileReader(header_row = 1, data_rows_from = 2, stream_rows = True, 
+                                           **source, **option)
+                # The file is read again when iterated a second time.
+                equal = (loaded.header() == streamed.header()) and \
+                        (loaded.rows() == list(streamed.iterate_rows())) and \
+                        (loaded.rows() == list(streamed.iterate_rows()))
+                print(('OK:     ' if equal else 'FAILED: ') + 
+                      str(list(source.keys())[0]) + ' ' + str(option) + ': ' + str(loaded.rows()))
+    except Exception as e:
+        print('Test failed: ' + str(e))
@@ -5,7 +5,8 @@
 # License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
 
 import time
-import toolbox_utils
+import threading
+import toolbox_utils
  
 @toolbox_utils.singleton
 class Logging(object):
@@ -15,13 +16,15 @@ class Logging(object):
     Tagged log rows can be of the types Info, Warning and Error.
     Similar log rows can be accumulated and printed with info about the number 
     of times they occurred. 
+    Warnings for many different items, i.e. taxon names, can be accumulated 
+    to one row containing all the items.
+    Accumulated rows are kept for each thread. Species lists loaded in a background 
+    thread will not clear or stop the accumulation for an import in the main thread.
     """
     def __init__(self):
         self._logtarget = None
-        self._accumulatedloggingactive = False
-        self._infoacc = {} # Contains accumulated info rows and counter.
-        self._warningacc = {} # Contains accumulated warnings and counter.
-        self._erroracc = {} # Contains accumulated errors and counter.
+        self._accumulated = AccumulatedRows() # One for each thread.
+        self._summary_callbacks = [] # (callback, thread id). Called when accumulated rows are logged.
         #
         self.set_log_target(DefaultLogTarget())
          
@@ -31,9 +34,22 @@ class Logging(object):
  
     def clear(self):
         """ Clears all accumulated log rows. """
-        self._infoacc.clear()
-        self._warningacc.clear()
-        self._erroracc.clear()
+        self._accumulated.info.clear()
+        self._accumulated.warning.clear()
+        self._accumulated.warning_item.clear()
+        self._accumulated.error.clear()
+    
+    def add_summary_callback(self, callback):
+        """ The callback is called without arguments when accumulated rows are 
+            logged in the calling thread, i.e. at the end of an import. Can be used 
+            to log summaries. """
+        callbackitem = (callback, threading.get_ident())
+        if callbackitem not in self._summary_callbacks:
+            self._summary_callbacks.append(callbackitem)
+    
+    def remove_summary_callback(self, callback):
+        """ Removes the callback for all threads. """
+        self._summary_callbacks = [item for item in self._summary_callbacks if item[0] != callback]
          
     def log(self, message):
         """ Used for direct logging. Also used by other methods in the class. """
@@ -51,27 +67,44 @@ class Logging(object):
             else:
                 print('')
    
+    def log_formatted_rows(self, rows):
+        """ Writes rows that already contains time info, i.e. rows collected 
+            in worker processes. """
+        for row in rows:
+            if self._logtarget:
+                self._logtarget.write_to_log(row)
+            else:
+                print(row)
+   
     def info(self, message):
         """ Accumulates info rows. Increment counter if it already exists. """
         message = str(message)
         message = 'INFO: ' + message
-        if self._accumulatedloggingactive:
-            if message in self._infoacc:
-                self._infoacc[message] += 1
+        if self._accumulated.active:
+            if message in self._accumulated.info:
+                self._accumulated.info[message] += 1
             else:
-                self._infoacc[message] = 1
+                self._accumulated.info[message] = 1
         else:
             self.log(message)
  
-    def warning(self, message):
-        """ Accumulates warnings. Increment counter if it already exists. """
+    def warning(self, message, item = None):
+        """ Accumulates warnings. Increment counter if it already exists. 
+            item: Optional, i.e. a taxon name. Logged as 'message: item'. When 
+            accumulated, all items for the same message are logged on one row. """
         message = str(message)
         message = 'WARNING: ' + message
-        if self._accumulatedloggingactive:
-            if message in self._warningacc:
-                self._warningacc[message] += 1
+        if self._accumulated.active:
+            if item is not None:
+                items = self._accumulated.warning_item.setdefault(message, {})
+                item = str(item)
+                items[item] = items.get(item, 0) + 1
+            elif message in self._accumulated.warning:
+                self._accumulated.warning[message] += 1
             else:
-                self._warningacc[message] = 1
+                self._accumulated.warning[message] = 1
+        elif item is not None:
+            self.log(message + ': ' + str(item))
         else:
             self.log(message)
          
@@ -79,25 +112,57 @@ class Logging(object):
         """ Accumulates errors. Increment counter if it already exists. """
         message = str(message)
         message = 'ERROR: ' + message
-        if self._accumulatedloggingactive:
-            if message in self._erroracc:
-                self._erroracc[message] += 1
+        if self._accumulated.active:
+            if message in self._accumulated.error:
+                self._accumulated.error[message] += 1
             else:
-                self._erroracc[message] = 1
+                self._accumulated.error[message] = 1
         else:
             self.log(message)
              
     def start_accumulated_logging(self):
         """ """
         self.clear()
-        self._accumulatedloggingactive = True
+        self._accumulated.active = True
+         
+    def get_accumulated_rows(self):
+        """ Returns a copy of the accumulated rows and counters. Used when rows 
+            are accumulated in worker processes, see add_accumulated_rows(). """
+        return {'info': dict(self._accumulated.info), 
+                'warning': dict(self._accumulated.warning), 
+                'warning_item': {message: dict(items) for message, items in self._accumulated.warning_item.items()}, 
+                'error': dict(self._accumulated.error), 
+                }
+          
+    def add_accumulated_rows(self, accumulated_rows):
+        """ Adds rows and counters returned by get_accumulated_rows(). """
+        for accumulated, rows in [(self._accumulated.info, accumulated_rows.get('info', {})), 
+                                  (self._accumulated.warning, accumulated_rows.get('warning', {})), 
+                                  (self._accumulated.error, accumulated_rows.get('error', {}))]:
+            for message, count in rows.items():
+                accumulated[message] = accumulated.get(message, 0) + count
+        for message, items in accumulated_rows.get('warning_item', {}).items():
+            accumulateditems = self._accumulated.warning_item.setdefault(message, {})
+            for item, count in items.items():
+                accumulateditems[item] = accumulateditems.get(item, 0) + count
          
     def log_all_accumulated_rows(self):
         """ """
-        self._accumulatedloggingactive = False
+        # Summaries are added before accumulation is stopped.
+        threadid = threading.get_ident()
+        for callback, callbackthreadid in list(self._summary_callbacks):
+            if callbackthreadid != threadid:
+                continue
+            try:
+                callback()
+            except Exception as e:
+                self.log('Failed to create log summary: ' + str(e))
+        #
+        self._accumulated.active = False
         #
-        errorcount = sum(self._erroracc.values())
-        warningcount = sum(self._warningacc.values())
+        errorcount = sum(self._accumulated.error.values())
+        warningcount = sum(self._accumulated.warning.values())
+        warningcount += sum(sum(items.values()) for items in self._accumulated.warning_item.values())
         #
         if (errorcount > 0) or (warningcount > 0):
             self.log('Accumulated log summary:')
@@ -116,8 +181,8 @@ class Logging(object):
         
     def log_all_info_rows(self):
         """ Log all the content in the accumulated info row list. """
-        for message in sorted(self._infoacc):
-            count = self._infoacc[message]
+        for message in sorted(self._accumulated.info):
+            count = self._accumulated.info[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
@@ -126,28 +191,41 @@ class Logging(object):
     def get_all_info_rows(self):
         """ Returns a list of strings. """
         result = []
-        for message in sorted(self._infoacc):
-            count = self._infoacc[message]
+        for message in sorted(self._accumulated.info):
+            count = self._accumulated.info[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
                 self.log('- ' + message + '   (' + str(count) + ' times)')
         return result
          
-    def log_all_warnings(self):
+    def log_all_warnings(self, max_items = 50):
         """ Log all the content in the accumulated warning list. """
-        for message in sorted(self._warningacc):
-            count = self._warningacc[message]
+        for message in sorted(self._accumulated.warning):
+            count = self._accumulated.warning[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
                 self.log('- ' + message + '   (' + str(count) + ' times)')
+        # Warnings with items. One row for each message.
+        for message in sorted(self._accumulated.warning_item):
+            items = self._accumulated.warning_item[message]
+            count = sum(items.values())
+            itemnames = sorted(items)
+            itemtext = ', '.join((item + ' (' + str(items[item]) + ')') if items[item] > 1 else item 
+                                 for item in itemnames[:max_items])
+            if len(itemnames) > max_items:
+                itemtext += ', ... (' + str(len(itemnames)) + ' different)'
+            if count == 1:
+                self.log('- ' + message + ': ' + itemtext + '   (' + str(count) + ' time)')
+            else:
+                self.log('- ' + message + ': ' + itemtext + '   (' + str(count) + ' times)')
          
     def get_all_warnings(self):
         """ Returns a list of strings. """
         result = []
-        for message in sorted(self._warningacc):
-            count = self._warningacc[message]
+        for message in sorted(self._accumulated.warning):
+            count = self._accumulated.warning[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
@@ -156,8 +234,8 @@ class Logging(object):
          
     def log_all_errors(self):
         """ Log all the content in the accumulated error list. """
-        for message in sorted(self._erroracc):
-            count = self._erroracc[message]
+        for message in sorted(self._accumulated.error):
+            count = self._accumulated.error[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
@@ -166,8 +244,8 @@ class Logging(object):
     def get_all_errors(self):
         """ Returns a list of strings. """
         result = []
-        for message in sorted(self._erroracc):
-            count = self._erroracc[message]
+        for message in sorted(self._accumulated.error):
+            count = self._accumulated.error[message]
             if count == 1:
                 self.log('- ' + message + '   (' + str(count) + ' time)')
             else:
@@ -175,6 +253,16 @@ class Logging(object):
         return result
  
  
+class AccumulatedRows(threading.local):
+    """ Accumulated log rows and counters. The attributes are local for each thread. """
+    def __init__(self):
+        self.active = False
+        self.info = {} # Contains accumulated info rows and counter.
+        self.warning = {} # Contains accumulated warnings and counter.
+        self.warning_item = {} # Contains accumulated warnings and a counter for each item.
+        self.error = {} # Contains accumulated errors and counter.
+
+
 class DefaultLogTarget(object):
     """ """
     def __init__(self):